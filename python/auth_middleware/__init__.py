@@ -1,5 +1,75 @@
-from .config import JwtConfig  # noqa: F401, F403
-from .service_claim import *  # noqa: F401, F403
-from .claim import *  # noqa: F401, F403
-from .role import *  # noqa: F401, F403
-from .version import * # noqa: F401, F403
+"""
+The public names of the package are imported lazily, from the module that
+defines them, the first time they are accessed: ``import auth_middleware``
+itself imports nothing else, and ``from auth_middleware import Claim`` only
+imports what ``Claim`` needs.
+"""
+import importlib
+
+from .version import __version__  # noqa: F401
+
+_exports = {
+    "config": ("JwtConfig", "JwtKeyRing", "UnknownKeyError"),
+    "cache": ("ClaimCache", "CacheStats", "DecisionCache"),
+    "schema": ("ClaimSchema", "InvalidClaimError"),
+    "service_claim": (
+        "ServiceTokenProvider",
+        "create_service_jwt_header",
+        "create_service_jwt_token",
+    ),
+    "claim": (
+        "TOKEN_ERRORS",
+        "Claim",
+        "ClaimType",
+        "CognitoSession",
+        "ServiceClaim",
+        "UserClaim",
+        "claim_from_dict",
+        "cognito_session_from_data",
+    ),
+    "role": (
+        "DatasetId",
+        "DatasetRole",
+        "Id",
+        "OrganizationId",
+        "OrganizationRole",
+        "Role",
+        "RoleIndex",
+        "RoleInternPool",
+        "WorkspaceId",
+        "WorkspaceRole",
+        "get_role_intern_pool",
+        "id_value",
+        "role_from_dict",
+        "set_role_intern_pool",
+    ),
+    "models": ("CognitoSessionType", "FeatureFlag", "Permission", "RoleType"),
+    "utils": ("clean_dict",),
+}
+_modules = {name: module for module, names in _exports.items() for name in names}
+# Re-exported under another name
+_aliases = {"PennsieveRole": ("models", "Role")}
+
+__all__ = sorted([*_modules, *_aliases])
+
+
+def __getattr__(name):
+    if name in _modules:
+        module, attribute = _modules[name], name
+    elif name in _aliases:
+        module, attribute = _aliases[name]
+    else:
+        # Submodules, e.g. `auth_middleware.models` after `import auth_middleware`
+        try:
+            return importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(__name__, name)
+            ) from None
+    value = getattr(importlib.import_module("." + module, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI middleware that verifies bearer tokens before requests reach the app.
+
+    app = JwtAuthMiddleware(app, JwtConfig("secret-key"))
+
+The verified ``Claim`` is stored in the connection scope under ``"claim"``,
+and in ``scope["state"]`` so that Starlette and FastAPI expose it as
+``request.state.claim``. The dependency helpers at the bottom of this module
+require Starlette (or FastAPI).
+"""
+import asyncio
+import json
+from concurrent.futures import Executor
+from functools import partial
+from typing import Collection, Optional
+
+from .cache import ClaimCache
+from .claim import TOKEN_ERRORS, Claim
+from .config import JwtConfig
+from .models import Permission
+from .role import DatasetId, OrganizationId
+from .utils import parse_bearer_token
+
+try:
+    from starlette.exceptions import HTTPException
+    from starlette.requests import HTTPConnection
+except ImportError:  # pragma: no cover
+    HTTPException = None
+    HTTPConnection = None
+
+SCOPE_KEY = "claim"
+
+
+class JwtAuthMiddleware:
+    """
+    Rejects HTTP and websocket connections without a valid bearer token, and
+    attaches the decoded ``Claim`` to the scope of the others.
+
+    Tokens longer than ``offload_threshold`` characters (those with many
+    roles) are verified in ``executor`` (the event loop's default thread pool
+    if ``None``) instead of on the event loop. Paths in ``exempt_paths`` are
+    passed through without a token.
+    """
+
+    def __init__(
+        self,
+        app,
+        config: JwtConfig,
+        cache: Optional[ClaimCache] = None,
+        offload_threshold: int = 4096,
+        executor: Optional[Executor] = None,
+        exempt_paths: Collection[str] = (),
+    ):
+        self.app = app
+        self.config = config
+        self.cache = cache
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] not in ("http", "websocket")
+            or scope.get("path") in self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        token = parse_bearer_token(_header(scope, b"authorization"))
+        if token is None:
+            await _reject(scope, send, "Missing bearer token")
+            return
+
+        try:
+            claim = await self._verify(token)
+        except TOKEN_ERRORS:
+            await _reject(scope, send, "Invalid bearer token")
+            return
+
+        scope[SCOPE_KEY] = claim
+        scope.setdefault("state", {})[SCOPE_KEY] = claim
+        await self.app(scope, receive, send)
+
+    async def _verify(self, token: str) -> Claim:
+        if len(token) <= self.offload_threshold:
+            return Claim.from_token(token, self.config, cache=self.cache)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            partial(Claim.from_token, token, self.config, cache=self.cache),
+        )
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _reject(scope, send, detail: str) -> None:
+    if scope["type"] == "websocket":
+        # Closing before the handshake is accepted rejects the connection.
+        await send({"type": "websocket.close", "code": 1008})
+        return
+
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"www-authenticate", b"Bearer"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def claim_from_scope(scope) -> Optional[Claim]:
+    return scope.get(SCOPE_KEY)
+
+
+# Dependencies for FastAPI, e.g.
+#
+#     @app.get("/datasets/{dataset_id}")
+#     def get_dataset(
+#         dataset_id: int,
+#         claim: Claim = Depends(require_dataset_access(DatasetPermission.VIEW_FILES)),
+#     ): ...
+
+
+def get_claim(connection: HTTPConnection) -> Claim:
+    claim = claim_from_scope(connection.scope)
+    if claim is None:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    return claim
+
+
+def require_organization_access(param: str = "organization_id"):
+    """
+    Dependency that requires access to the organization given by the path
+    parameter ``param``.
+    """
+
+    def dependency(connection: HTTPConnection) -> Claim:
+        claim = get_claim(connection)
+        organization_id = connection.path_params.get(param)
+        if organization_id is None or not claim.has_organization_access(
+            OrganizationId(organization_id)
+        ):
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return claim
+
+    return dependency
+
+
+def require_dataset_access(permission: Permission, param: str = "dataset_id"):
+    """
+    Dependency that requires ``permission`` on the dataset given by the path
+    parameter ``param``.
+    """
+
+    def dependency(connection: HTTPConnection) -> Claim:
+        claim = get_claim(connection)
+        dataset_id = connection.path_params.get(param)
+        if dataset_id is None or not claim.has_dataset_access(
+            DatasetId(dataset_id), permission
+        ):
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return claim
+
+    return dependency
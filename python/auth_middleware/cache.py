@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
+
+from . import instrumentation
+from .config import JwtConfig, JwtKeyRing
+
+if TYPE_CHECKING:
+    import datetime
+
+    from .claim import Claim  # noqa: F401
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class ClaimCache:
+    """
+    Bounded cache of verified claims, keyed by a digest of the token and the
+    ``JwtConfig`` or ``JwtKeyRing`` used to verify it.
+
+    Entries are evicted when they are the least recently used or once the
+    token's ``exp`` has passed. Cached ``Claim`` instances are shared between
+    callers and must not be mutated.
+
+    With ``decision_cache_size``, the claims loaded by the cache memoize their
+    permission checks (see ``Claim.cache_decisions``), so that requests
+    sharing a token share the answers as well.
+    """
+
+    def __init__(self, maxsize: int = 1024, decision_cache_size: int = 0):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.decision_cache_size = decision_cache_size
+        self._entries: "OrderedDict[Tuple[bytes, object], Tuple[Claim, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(token, config: Union[JwtConfig, JwtKeyRing]) -> Tuple[bytes, object]:
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        return hashlib.sha256(token).digest(), config
+
+    def get_or_load(
+        self, token, config: Union[JwtConfig, JwtKeyRing], load: Callable[[], "Claim"]
+    ) -> "Claim":
+        key = self._key(token, config)
+        now = time.time()
+        outcome = "miss"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    outcome = "hit"
+                else:
+                    del self._entries[key]
+                    self._evictions += 1
+                    outcome = "expired"
+            if outcome != "hit":
+                self._misses += 1
+
+        if instrumentation.current.enabled:
+            instrumentation.current.cache_lookup(outcome)
+        if outcome == "hit":
+            return entry[0]  # type: ignore
+
+        # Decode outside of the lock: concurrent misses for the same token may
+        # both verify it, but neither blocks unrelated lookups.
+        claim = load()
+        if self.decision_cache_size > 0:
+            claim.cache_decisions(self.decision_cache_size)
+        expires_at = claim.exp.timestamp()
+        if expires_at <= now:
+            return claim
+
+        with self._lock:
+            self._entries[key] = (claim, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return claim
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+            )
+
+
+_MISSING = object()
+
+
+class DecisionCache:
+    """
+    Bounded memo of the answers to the permission checks of one ``Claim``,
+    keyed by the check and its arguments. See ``Claim.cache_decisions``.
+
+    All answers are dropped once the claim's ``exp`` has passed, or when its
+    ``exp`` is replaced. When the cache is full, the oldest answers are
+    evicted first. Hits and misses are only counted with ``stats``.
+    """
+
+    def __init__(self, maxsize: int = 256, stats: bool = False):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._answers: Dict[tuple, Any] = {}
+        self._exp: Optional["datetime.datetime"] = None
+        self._expires_at = float("-inf")
+        self._count = stats
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def get_or_compute(
+        self, exp: "datetime.datetime", key: tuple, compute: Callable, *args
+    ) -> Any:
+        if exp is not self._exp or time.time() >= self._expires_at:
+            self._reset(exp)
+        try:
+            answer = self._answers.get(key, _MISSING)
+        except TypeError:
+            # Unhashable arguments
+            return compute(*args)
+        if answer is not _MISSING:
+            if self._count:
+                self._hits += 1
+            return answer
+
+        if self._count:
+            self._misses += 1
+        answer = compute(*args)
+        answers = self._answers
+        if len(answers) >= self.maxsize:
+            # Dicts preserve insertion order: evict the oldest answer
+            try:
+                answers.pop(next(iter(answers)), None)
+            except (StopIteration, RuntimeError):
+                pass
+            else:
+                if self._count:
+                    self._evictions += 1
+        answers[key] = answer
+        return answer
+
+    def _reset(self, exp: "datetime.datetime") -> None:
+        if self._count:
+            self._evictions += len(self._answers)
+        # Replaced rather than cleared, for concurrent readers
+        self._answers = {}
+        self._exp = exp
+        self._expires_at = exp.timestamp()
+
+    def clear(self) -> None:
+        self._answers = {}
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            size=len(self._answers),
+        )
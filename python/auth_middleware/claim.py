@@ -1,24 +1,61 @@
 import jwt
+import dataclasses
 import datetime
 import json
-from typing import List, Optional, Union
+from calendar import timegm
+from functools import wraps
+from itertools import repeat
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass, field
-from dataclasses_json import dataclass_json
-from . import JwtConfig
-from .utils import clean_dict
-from .role import role_from_dict, Role, Id, OrganizationId, DatasetId, WorkspaceId
-from .models import CognitoSessionType, Permission, FeatureFlag, Role as PennsieveRole
+from .config import JwtConfig, JwtKeyRing
+from . import instrumentation
+from .cache import ClaimCache, DecisionCache
+from .compact import compact_payload, expand_payload, is_compact
+from .decoder import compile_decoder
+from .encoder import encoder_for
+from .instrumentation import PhaseTimings, instrumented_check, rejection_reason
+from .utils import lazy_dataclass_json, with_slots
+from .verify import (
+    decode,
+    parse_payload,
+    validate_registered_claims,
+    verification_config,
+    verify_signature,
+)
+from . import json_backend, schema
+from .role import (
+    role_from_dict,
+    Role,
+    RoleIndex,
+    Id,
+    OrganizationId,
+    DatasetId,
+    WorkspaceId,
+    id_value,
+)
+from .models import (
+    CognitoSessionType,
+    Permission,
+    FeatureFlag,
+    Role as PennsieveRole,
+    permission_mask,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
 
 
 def cognito_session_from_data(data) -> Optional["CognitoSession"]:
     if isinstance(data, dict):
-        if data["type"] in CognitoSessionType.values():
-            return CognitoSession.from_json(json.dumps(data))  # type: ignore
+        if CognitoSessionType.from_value_or_none(data["type"]) is not None:
+            return _decode_cognito_session(data)
     return None
 
 
-@dataclass_json
-@dataclass
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class CognitoSession:
     id: str
     type: CognitoSessionType
@@ -33,16 +70,22 @@ class CognitoSession:
         return self.type == CognitoSessionType.API
 
 
-@dataclass_json
-@dataclass
+_decode_cognito_session = compile_decoder(CognitoSession)
+
+
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class ClaimType:
+    # A list: claims are frozen, but not hashable
     roles: List[Role] = field(
         metadata={"dataclasses_json": {"decoder": role_from_dict}}
     )
 
 
-@dataclass_json
-@dataclass
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class UserClaim(ClaimType):
     id: int
     type: str = "user_claim"
@@ -52,77 +95,312 @@ class UserClaim(ClaimType):
     node_id: Optional[str] = None
 
 
-@dataclass_json
-@dataclass
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class ServiceClaim(ClaimType):
     type: str = "service_claim"
 
 
+_decode_user_claim = compile_decoder(UserClaim)
+_decode_service_claim = compile_decoder(ServiceClaim)
+
+
 def claim_from_dict(data) -> ClaimType:
     if data["type"] == "user_claim":
-        cls = UserClaim
+        decode = _decode_user_claim
     elif data["type"] == "service_claim":
-        cls = ServiceClaim
+        decode = _decode_service_claim
     else:
         raise ValueError("Invalid claim type {}".format(data["type"]))
 
-    return cls.from_json(json.dumps(data))  # type: ignore
+    return decode(data)
+
+
+def _cached_decision(func):
+    """
+    Answer from the claim's decision cache, if enabled with
+    ``Claim.cache_decisions``.
+    """
+    check = func.__name__
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        decisions = self._decisions
+        if decisions is None or kwargs:
+            return func(self, *args, **kwargs)
+        return decisions.get_or_compute(self.exp, (check, *args), func, self, *args)
+
+    return wrapper
+
+
+# Exceptions raised by `Claim.from_token` for tokens that cannot be accepted:
+# failed verification, or a payload that does not decode to a valid claim.
+TOKEN_ERRORS = (jwt.PyJWTError, ValueError, KeyError, TypeError, AttributeError)
 
 
 @dataclass
 class Claim:
+    # Backing attribute of the `content` property. Declared first so that
+    # `__init__` resets it before setting `content` through the property.
+    _content: Optional[ClaimType] = field(
+        default=None, init=False, repr=False, compare=False
+    )
     content: ClaimType
     exp: datetime.datetime
     iat: datetime.datetime = datetime.datetime.utcnow()
+    _role_index: Optional[RoleIndex] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # Raw, verified payload of a lazily decoded claim, until `content` is
+    # first accessed. See `from_dict`.
+    _payload: Optional[dict] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # (content, compact, serialized content) kept by
+    # `encode(..., cache_content=True)`
+    _content_json: Optional[Tuple[ClaimType, bool, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # See `cache_decisions`
+    _decisions: Optional[DecisionCache] = field(
+        default=None, init=False, repr=False, compare=False
+    )
 
     @property
     def is_valid(self) -> bool:
         return (datetime.datetime.utcnow() - self.exp).total_seconds() < 0
 
-    def encode(self, config: JwtConfig) -> bytes:
-        data = clean_dict(json.loads(self.content.to_json()))  # type: ignore
-        data["exp"] = self.exp
-        data["iat"] = self.iat
-        return jwt.encode(data, config.key, algorithm=config.algorithm)
+    def encode(
+        self,
+        config: Union[JwtConfig, JwtKeyRing],
+        cache_content: bool = False,
+        compact: bool = False,
+    ) -> str:
+        """
+        Sign the claim. The payload is the same as PyJWT would produce for
+        the content's ``to_json`` without ``None`` values. The ``kid`` of the
+        signing key, if any, is added to the token header.
+
+        With ``compact``, the payload uses the smaller format described in
+        ``auth_middleware.compact``, which only this library can decode.
+
+        With ``cache_content``, the serialized content is kept on the claim
+        and reused as long as ``content`` is not replaced, so that re-signing
+        the claim with a new ``exp`` only serializes the timestamps.
+        """
+        content = self.content
+        cached = self._content_json
+        if cached is not None and cached[0] is content and cached[1] == compact:
+            content_json = cached[2]
+        else:
+            data = encoder_for(type(content))(content)
+            if compact:
+                data = compact_payload(data)
+            content_json = json_backend._backend.dumps(data)
+            if cache_content:
+                self._content_json = (content, compact, content_json)
+
+        timestamps = '"exp":{},"iat":{}}}'.format(
+            _encode_time(self.exp), _encode_time(self.iat)
+        )
+        if content_json == "{}":
+            payload = "{" + timestamps
+        else:
+            payload = content_json[:-1] + "," + timestamps
+
+        config = config.signing_config
+        return jwt.api_jws.encode(
+            payload.encode("utf-8"),
+            config.signing_key,
+            algorithm=config.algorithm,
+            headers=None if config.kid is None else {"kid": config.kid},
+        )
 
     @classmethod
-    def from_token(cls, token: str, config: JwtConfig) -> "Claim":
-        data = jwt.decode(token, config.key, algorithms=[config.algorithm], verify=True)
-        return cls.from_dict(data)
+    def from_token(
+        cls,
+        token: str,
+        config: Union[JwtConfig, JwtKeyRing],
+        cache: Optional[ClaimCache] = None,
+        lazy: bool = False,
+    ) -> "Claim":
+        if cache is not None:
+            return cache.get_or_load(
+                token, config, lambda: cls.from_token(token, config, lazy=lazy)
+            )
+        if instrumentation.current.enabled:
+            return cls._from_token_instrumented(token, config, lazy)
+        claim_schema = schema._schema
+        if claim_schema is not None:
+            claim_schema.check_token(token)
+        data = decode(token, verification_config(token, config))
+        if claim_schema is not None:
+            data = claim_schema.validate(data)
+        return cls.from_dict(data, lazy=lazy)
 
     @classmethod
-    def from_dict(cls, data) -> "Claim":
+    def _from_token_instrumented(cls, token, config, lazy: bool) -> "Claim":
+        hooks = instrumentation.current
+        claim_schema = schema._schema
+        try:
+            if claim_schema is not None:
+                claim_schema.check_token(token)
+            start = perf_counter()
+            payload = verify_signature(token, verification_config(token, config))
+            verified = perf_counter()
+            data = parse_payload(payload)
+            validate_registered_claims(data)
+            if claim_schema is not None:
+                data = claim_schema.validate(data)
+            parsed = perf_counter()
+            claim = cls.from_dict(data, lazy=lazy)
+            decoded = perf_counter()
+        except TOKEN_ERRORS as e:
+            hooks.token_rejected(rejection_reason(e), len(token))
+            raise
+
+        roles = data.get("roles")
+        hooks.token_verified(
+            PhaseTimings(
+                signature=verified - start,
+                parse=parsed - verified,
+                decode=decoded - parsed,
+            ),
+            len(token),
+            len(roles) if isinstance(roles, list) else 0,
+        )
+        return claim
+
+    @classmethod
+    def from_tokens(
+        cls,
+        tokens: Iterable[str],
+        config: Union[JwtConfig, JwtKeyRing],
+        cache: Optional[ClaimCache] = None,
+        executor: Optional["Executor"] = None,
+    ) -> List[Union["Claim", Exception]]:
+        """
+        Decode a batch of tokens, returning one result per token in input order.
+
+        Identical tokens are only decoded once. A token that fails to decode
+        (expired, bad signature, invalid claim...) yields the exception
+        instead of a ``Claim`` and does not affect the rest of the batch. If an
+        ``executor`` is given, the distinct tokens are decoded with it.
+        """
+        tokens = list(tokens)
+        distinct = list(dict.fromkeys(tokens))
+        if executor is None:
+            results = [_claim_or_error(cls, token, config, cache) for token in distinct]
+        else:
+            results = list(
+                executor.map(
+                    _claim_or_error,
+                    repeat(cls),
+                    distinct,
+                    repeat(config),
+                    repeat(cache),
+                )
+            )
+        decoded = dict(zip(distinct, results))
+        return [decoded[token] for token in tokens]
+
+    @classmethod
+    def from_dict(cls, data, lazy: bool = False) -> "Claim":
+        """
+        Payloads in the compact format are accepted as well.
+
+        With ``lazy``, only the claim type is checked up front. Roles are
+        decoded one at a time as the role accessors need them, and the full
+        ``content`` is decoded the first time it is accessed.
+        """
+        if is_compact(data):
+            data = expand_payload(data)
         if "exp" not in data or "iat" not in data:
             raise KeyError("Claims need an expiration and issued at timestamp")
         exp = datetime.datetime.fromtimestamp(data.pop("exp"))
         iat = datetime.datetime.fromtimestamp(data.pop("iat"))
-        return cls(claim_from_dict(data), exp, iat)
+        if not lazy:
+            return cls(claim_from_dict(data), exp, iat)
+
+        if data["type"] not in ("user_claim", "service_claim"):
+            raise ValueError("Invalid claim type {}".format(data["type"]))
+        claim = cls(None, exp, iat)  # type: ignore
+        claim._payload = data
+        return claim
 
     @classmethod
     def from_claim_type(cls, content: ClaimType, seconds: int) -> "Claim":
         now = datetime.datetime.utcnow()
         return cls(content, now + datetime.timedelta(seconds=seconds))
 
+    def _get_content(self) -> ClaimType:
+        content = self._content
+        if content is None and self._payload is not None:
+            # The roles are decoded through the index, reusing those already
+            # decoded, only once the list is used: `claim.content.id` decodes
+            # no role. The index stays current for the materialized content.
+            roles = self.role_index.lazy_roles()
+            content = claim_from_dict(dict(self._payload, roles=[]))
+            content = dataclasses.replace(content, roles=roles)
+            self._content = content
+            self._payload = None
+        # Only None for a claim explicitly created without content
+        return content  # type: ignore
+
+    def _set_content(self, content: ClaimType) -> None:
+        self._content = content
+        self._payload = None
+        # Not set yet when called from `__init__`
+        decisions = getattr(self, "_decisions", None)
+        if decisions is not None:
+            decisions.clear()
+
+    def cache_decisions(self, maxsize: int = 256, stats: bool = False) -> DecisionCache:
+        """
+        Memoize the answers of ``has_dataset_access``, ``has_workspace_access``,
+        ``has_feature_enabled`` and ``encryption_key_id`` on this claim, until
+        its ``exp`` or its ``content`` is replaced. Repeated checks are then a
+        single dict lookup.
+
+        Returns the claim's ``DecisionCache``, for its ``stats()``; calling this
+        again returns the existing cache.
+        """
+        if self._decisions is None:
+            self._decisions = DecisionCache(maxsize, stats=stats)
+        return self._decisions
+
+    @property
+    def role_index(self) -> RoleIndex:
+        index = self._role_index
+        if self._content is None and self._payload is not None:
+            if index is None:
+                index = RoleIndex.from_payload(self._payload["roles"])
+                self._role_index = index
+            return index
+
+        roles = self.content.roles
+        if index is None or not index.is_current(roles):
+            index = RoleIndex(roles)
+            self._role_index = index
+        return index
+
     def _head_role_id(self, role_type: PennsieveRole) -> Optional[Id]:
-        for role in self.content.roles:
-            if role.type == role_type:
-                return role.id
-        return None
+        role = self.role_index.first_of_type(role_type)
+        return role.id if role else None
 
     def _head_role_node_id(self, role_type: PennsieveRole) -> Optional[str]:
-        for role in self.content.roles:
-            if role.type == role_type:
-                return role.node_id
-        return None
+        role = self.role_index.first_of_type(role_type)
+        return role.node_id if role else None
 
     def _role_ids(self, role_type: PennsieveRole) -> List[Id]:
-        return [role.id for role in self.content.roles if role.type == role_type]
+        return [role.id for role in self.role_index.of_type(role_type)]
 
     def _role_node_ids(self, role_type: PennsieveRole) -> List[str]:
         return [
             role.node_id
-            for role in self.content.roles
-            if role.type == role_type and role.node_id is not None
+            for role in self.role_index.of_type(role_type)
+            if role.node_id is not None
         ]
 
     @property
@@ -150,12 +428,11 @@ class Claim:
         return self._head_role_node_id(PennsieveRole.ORGANIZATION_ROLE)
 
     def organization_node_id(self, orgainization_id: OrganizationId) -> Optional[str]:
-        for role in self.content.roles:
-            if (
-                role.type == PennsieveRole.ORGANIZATION_ROLE
-                and role.id == orgainization_id
-            ):
-                return role.node_id
+        role = self.role_index.get_exact(
+            orgainization_id, PennsieveRole.ORGANIZATION_ROLE
+        )
+        if role:
+            return role.node_id
         return None
 
     @property
@@ -169,11 +446,14 @@ class Claim:
     def enabled_features(
         self, organization_id: OrganizationId
     ) -> Optional[List[FeatureFlag]]:
-        role = self.get_role(organization_id)
+        role = self.get_role(_as_id(organization_id, OrganizationId))
         if role:
-            return role.enabled_features  # type:ignore
+            # A new list, as before roles stored their features as a tuple
+            features = role.enabled_features  # type:ignore
+            return None if features is None else list(features)
         return None
 
+    @_cached_decision
     def has_feature_enabled(
         self, organization_id: OrganizationId, feature: FeatureFlag
     ) -> bool:
@@ -182,42 +462,149 @@ class Claim:
             return feature in features
         return False
 
+    @_cached_decision
     def encryption_key_id(self, organization_id: OrganizationId) -> Optional[str]:
-        role = self.get_role(organization_id)
+        role = self.get_role(_as_id(organization_id, OrganizationId))
         if role:
             return role.encryption_key_id  # type:ignore
         return None
 
+    @instrumented_check
     def has_organization_access(self, organization_id: OrganizationId) -> bool:
-        return self.get_role(organization_id) is not None
+        return self.get_role(_as_id(organization_id, OrganizationId)) is not None
 
+    @instrumented_check
+    @_cached_decision
     def has_dataset_access(self, dataset_id: DatasetId, permission: Permission) -> bool:
-        role = self.get_role(dataset_id)
+        role = self.get_role(_as_id(dataset_id, DatasetId))
         if role:
             return role.has_permission(permission)
         return False
 
+    @instrumented_check
+    @_cached_decision
     def has_workspace_access(
         self, workspace_id: WorkspaceId, permission: Permission
     ) -> bool:
-        role = self.get_role(workspace_id)
+        role = self.get_role(_as_id(workspace_id, WorkspaceId))
         if role:
             return role.has_permission(permission)
         return False
 
+    def has_dataset_access_many(
+        self,
+        dataset_ids: Iterable[Any],
+        permissions: Union[Permission, Iterable[Permission]],
+    ) -> List[bool]:
+        """
+        ``has_dataset_access`` for each of ``dataset_ids``, in input order.
+
+        Ids can be raw ids (as found in tokens or URLs) or ``DatasetId``s;
+        ``Id``s of other types are denied.
+        ``permissions`` is a single permission or several, which must all be
+        granted. The roles are only looked up once for the whole batch.
+        """
+        return self._access_many(DatasetId, dataset_ids, permissions)
+
+    def filter_dataset_access(
+        self,
+        dataset_ids: Iterable[Any],
+        permissions: Union[Permission, Iterable[Permission]],
+    ) -> list:
+        """
+        The ids of ``dataset_ids`` that ``has_dataset_access_many`` grants,
+        in input order.
+        """
+        dataset_ids = list(dataset_ids)
+        granted = self._access_many(DatasetId, dataset_ids, permissions)
+        return [id_ for id_, allowed in zip(dataset_ids, granted) if allowed]
+
+    def has_workspace_access_many(
+        self,
+        workspace_ids: Iterable[Any],
+        permissions: Union[Permission, Iterable[Permission]],
+    ) -> List[bool]:
+        return self._access_many(WorkspaceId, workspace_ids, permissions)
+
+    def filter_workspace_access(
+        self,
+        workspace_ids: Iterable[Any],
+        permissions: Union[Permission, Iterable[Permission]],
+    ) -> list:
+        workspace_ids = list(workspace_ids)
+        granted = self._access_many(WorkspaceId, workspace_ids, permissions)
+        return [id_ for id_, allowed in zip(workspace_ids, granted) if allowed]
+
+    def _access_many(self, id_type: type, ids, permissions) -> List[bool]:
+        if isinstance(permissions, (Permission, str)):
+            permissions = [permissions]
+        try:
+            required = permission_mask(permissions)
+        except KeyError:
+            # Unknown permissions are never granted
+            return [False for _ in ids]
+
+        masks, wildcard = self.role_index.masks(id_type)
+        granted = {id_ for id_, mask in masks.items() if mask & required == required}
+        if wildcard is not None and wildcard & required == required:
+            # Ids without a role of their own are granted by the wildcard role
+            denied = masks.keys() - granted
+            return [
+                _lookup_key(id_, id_type) not in denied and _matches_type(id_, id_type)
+                for id_ in ids
+            ]
+        return [_lookup_key(id_, id_type) in granted for id_ in ids]
+
     @property
     def is_service_claim(self) -> bool:
+        if self._content is None and self._payload is not None:
+            return self._payload["type"] == "service_claim"
         return isinstance(self.content, ServiceClaim)
 
     @property
     def is_user_claim(self) -> bool:
+        if self._content is None and self._payload is not None:
+            return self._payload["type"] == "user_claim"
         return isinstance(self.content, UserClaim)
 
     def get_role(self, role_id: Id) -> Optional[Role]:
-        wildcard_role = None
-        for role in self.content.roles:
-            if role.id == role_id:
-                return role
-            if role.id.matches(role_id) and wildcard_role is None:
-                wildcard_role = role
-        return wildcard_role
+        """
+        Raw ids (ints, strings) have no id type, and match no role.
+        """
+        return self.role_index.get(role_id)
+
+
+# `content` is decoded on first access for lazily decoded claims. The property
+# is attached after the dataclass is created so that `content` remains a
+# regular constructor argument and field.
+Claim.content = property(Claim._get_content, Claim._set_content)  # type: ignore
+
+
+def _as_id(role_id, id_type):
+    # Raw ids are accepted wherever the id type is known, as in `_access_many`
+    return role_id if isinstance(role_id, Id) else id_type(role_id)
+
+
+def _matches_type(role_id, id_type: type) -> bool:
+    # Ids of another type (e.g. an OrganizationId) never match
+    return not isinstance(role_id, Id) or type(role_id) is id_type
+
+
+def _lookup_key(role_id, id_type: type) -> Optional[int]:
+    if type(role_id) is int:
+        return role_id
+    return id_value(role_id) if _matches_type(role_id, id_type) else None
+
+
+def _encode_time(value) -> str:
+    # Same conversion as PyJWT applies to datetime `exp` and `iat` claims
+    if isinstance(value, datetime.datetime):
+        return str(timegm(value.utctimetuple()))
+    return json.dumps(value)
+
+
+def _claim_or_error(cls, token, config, cache) -> Union[Claim, Exception]:
+    try:
+        return cls.from_token(token, config, cache=cache)
+    except Exception as e:
+        return e
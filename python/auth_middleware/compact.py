@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Compact claim payload format.
+
+The compact format carries the same information as the regular payload with
+shorter keys and codes, and is marked by its format version ``"v"``:
+
+    {"v": 1, "t": "u", "i": 12345, "n": "38e9544e-...", "r": [
+        {"t": "o", "i": 1, "r": 4, "f": 5, "k": "arn:..."},
+        {"t": "d", "i": 2, "r": 2, "n": "5a3f9c1d-...", "l": true}
+    ], "exp": ..., "iat": ...}
+
+* claim and role types, role types and cognito session types are short codes
+* ``enabled_features`` is a bit mask over ``FeatureFlag``
+* node ids of the form ``N:<kind>:<id>`` are stored without their prefix under
+  ``"n"``, the kind being implied by the claim or role type; other node ids
+  are kept verbatim under ``"N"``
+
+Payloads are converted back to the regular format before being decoded, so
+both formats decode to the same ``Claim``. The codes below are part of the
+format: they must never change, and new feature flags must be added at the end
+of ``FeatureFlag``.
+"""
+from typing import Any, Dict, List
+
+from .models import FeatureFlag
+
+FORMAT_VERSION = 1
+VERSION_KEY = "v"
+
+_claim_types = {"user_claim": "u", "service_claim": "s"}
+_role_kinds = {"organization_role": "o", "dataset_role": "d", "workspace_role": "w"}
+_role_types = {"guest": 0, "viewer": 1, "editor": 2, "manager": 3, "owner": 4}
+_session_types = {"browser": "b", "api": "a"}
+_node_prefixes = {
+    "user_claim": "N:user:",
+    "organization_role": "N:organization:",
+    "dataset_role": "N:dataset:",
+    "workspace_role": "N:workspace:",
+}
+_feature_bits: Dict[str, int] = {
+    feature.value: 1 << position for position, feature in enumerate(FeatureFlag)
+}
+
+
+def _inverse(table: dict) -> dict:
+    return {code: value for value, code in table.items()}
+
+
+_claim_type_names = _inverse(_claim_types)
+_role_kind_names = _inverse(_role_kinds)
+_role_type_names = _inverse(_role_types)
+_session_type_names = _inverse(_session_types)
+
+
+def is_compact(data: dict) -> bool:
+    # Regular payloads may carry a "v" claim of their own, but always have a
+    # type and roles
+    return VERSION_KEY in data and "type" not in data and "roles" not in data
+
+
+def _pack_node_id(node_id: str, type_: str, compact: dict) -> None:
+    prefix = _node_prefixes.get(type_)
+    if prefix and node_id.startswith(prefix):
+        compact["n"] = node_id[len(prefix) :]
+    else:
+        compact["N"] = node_id
+
+
+def _unpack_node_id(compact: dict, type_: str, data: dict) -> None:
+    if "n" in compact:
+        data["node_id"] = _node_prefixes[type_] + compact["n"]
+    elif "N" in compact:
+        data["node_id"] = compact["N"]
+
+
+def _feature_mask(features: List[str]) -> int:
+    mask = 0
+    for feature in features:
+        mask |= _feature_bits[feature]
+    return mask
+
+
+def _features(mask: int) -> List[str]:
+    # Bits of flags unknown to this version of the library are ignored, as
+    # unknown flags are in the regular format.
+    return [feature for feature, bit in _feature_bits.items() if mask & bit]
+
+
+def _compact_role(role: dict) -> dict:
+    type_ = role["type"]
+    compact: Dict[str, Any] = {"t": _role_kinds[type_]}
+    if "id" in role:
+        compact["i"] = role["id"]
+    if "role" in role:
+        compact["r"] = _role_types.get(role["role"], role["role"])
+    if "node_id" in role:
+        _pack_node_id(role["node_id"], type_, compact)
+    if "enabled_features" in role:
+        compact["f"] = _feature_mask(role["enabled_features"])
+    if "encryption_key_id" in role:
+        compact["k"] = role["encryption_key_id"]
+    if "locked" in role:
+        compact["l"] = role["locked"]
+    return compact
+
+
+def _expand_role(compact: dict) -> dict:
+    type_ = _role_kind_names[compact["t"]]
+    role = {"type": type_}
+    if "i" in compact:
+        role["id"] = compact["i"]
+    if "r" in compact:
+        role["role"] = _role_type_names.get(compact["r"], compact["r"])
+    _unpack_node_id(compact, type_, role)
+    if "f" in compact:
+        role["enabled_features"] = _features(compact["f"])
+    if "k" in compact:
+        role["encryption_key_id"] = compact["k"]
+    if "l" in compact:
+        role["locked"] = compact["l"]
+    return role
+
+
+def compact_payload(data: dict) -> dict:
+    """
+    Convert an encoded claim (as produced by ``encoder_for``) to the compact
+    format.
+    """
+    type_ = data["type"]
+    compact = {VERSION_KEY: FORMAT_VERSION, "t": _claim_types[type_]}
+    if "id" in data:
+        compact["i"] = data["id"]
+    if "node_id" in data:
+        _pack_node_id(data["node_id"], type_, compact)
+    if "cognito" in data:
+        cognito = data["cognito"]
+        if isinstance(cognito, dict):
+            cognito = {
+                "i": cognito["id"],
+                "t": _session_types[cognito["type"]],
+                "e": cognito["exp"],
+            }
+        compact["c"] = cognito
+    compact["r"] = [_compact_role(role) for role in data["roles"]]
+    return compact
+
+
+def expand_payload(compact: dict) -> dict:
+    """
+    Convert a compact payload back to the regular format. Keys other than the
+    ones of the compact format (such as ``exp`` and ``iat``) are kept.
+    """
+    version = compact[VERSION_KEY]
+    if version != FORMAT_VERSION:
+        raise ValueError("Unsupported claim format version {}".format(version))
+
+    data = {
+        key: value
+        for key, value in compact.items()
+        if key not in (VERSION_KEY, "t", "i", "n", "N", "c", "r")
+    }
+    type_ = _claim_type_names[compact["t"]]
+    data["type"] = type_
+    if "i" in compact:
+        data["id"] = compact["i"]
+    _unpack_node_id(compact, type_, data)
+    if "c" in compact:
+        cognito = compact["c"]
+        if isinstance(cognito, dict):
+            cognito = {
+                "id": cognito["i"],
+                "type": _session_type_names[cognito["t"]],
+                "exp": cognito["e"],
+            }
+        data["cognito"] = cognito
+    data["roles"] = [_expand_role(role) for role in compact["r"]]
+    return data
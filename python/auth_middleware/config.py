@@ -1,8 +1,159 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional
 
+import jwt
+from jwt.algorithms import get_default_algorithms
 
-@dataclass
+_algorithms = get_default_algorithms()
+# Reentrant: loading the public key loads the key first
+_prepare_lock = threading.RLock()
+
+
+class UnknownKeyError(jwt.InvalidTokenError):
+    """
+    The ``kid`` header of a token does not match any verification key.
+    """
+
+
+@dataclass(frozen=True)
 class JwtConfig:
-    key: str
+    """
+    A key and the algorithm it is used with.
+
+    For HMAC algorithms (``HS256``...) ``key`` is the shared secret. For
+    asymmetric algorithms (``RS256``, ``ES256``, ``EdDSA``...) ``key`` is a PEM
+    encoded key or an already loaded ``cryptography`` key object: a private key
+    signs tokens and also verifies them with its public key, while a public key
+    can only verify them.
+
+    The key is loaded the first time it is used and reused afterwards, instead
+    of being parsed by PyJWT on every ``encode``/``decode`` call.
+    """
+
+    key: Any
     algorithm: str = "HS256"
+    # Stamped in the header of the tokens signed with this config, and used by
+    # `JwtKeyRing` to select the key that verifies a token.
+    kid: Optional[str] = None
+    _prepared: Dict[str, Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False, hash=False
+    )
+
+    def __hash__(self) -> int:
+        # Key objects are not hashable, but equal keys have the same type.
+        key = self.key
+        if not isinstance(key, (str, bytes)):
+            key = type(key)
+        return hash((key, self.algorithm, self.kid))
+
+    def __reduce__(self):
+        # Loaded keys are not picklable, and are cheap to load again.
+        return type(self), (self.key, self.algorithm, self.kid)
+
+    def _load(self, name: str, load: Callable[[], Any]) -> Any:
+        prepared = self._prepared.get(name)
+        if prepared is None:
+            with _prepare_lock:
+                prepared = self._prepared.get(name)
+                if prepared is None:
+                    prepared = self._prepared[name] = load()
+        return prepared
+
+    def _prepare(self) -> Any:
+        try:
+            algorithm = _algorithms[self.algorithm]
+        except KeyError:
+            raise NotImplementedError(
+                "Algorithm not supported: {}".format(self.algorithm)
+            )
+        return algorithm.prepare_key(self.key)
+
+    def _public(self) -> Any:
+        key = self._load("key", self._prepare)
+        # Private keys verify with their public key, HMAC with the secret
+        public_key = getattr(key, "public_key", None)
+        return key if public_key is None else public_key()
+
+    @property
+    def signing_key(self) -> Any:
+        key = self._load("key", self._prepare)
+        if not isinstance(key, bytes) and not hasattr(key, "sign"):
+            raise ValueError(
+                "A {} public key cannot sign tokens".format(self.algorithm)
+            )
+        return key
+
+    @property
+    def verification_key(self) -> Any:
+        return self._load("public", self._public)
+
+    @property
+    def signing_config(self) -> "JwtConfig":
+        return self
+
+    def verification_config(self, kid: Optional[str]) -> "JwtConfig":
+        # A single key verifies tokens regardless of their `kid`.
+        return self
+
+
+class JwtKeyRing:
+    """
+    Several keys, identified by their ``kid``, for rotating keys without
+    downtime.
+
+    Tokens are signed with the ``active_kid`` key, and stamped with its kid.
+    Tokens are verified with the key named by their ``kid`` header, a single
+    dict lookup, so that tokens signed with a previous key only cost one
+    verification. Tokens without a ``kid`` (signed before the rotation) are
+    verified with the ``default_kid`` key if there is one, and rejected
+    otherwise.
+
+    A key ring can be used wherever a ``JwtConfig`` is expected by
+    ``Claim.encode`` and ``Claim.from_token``.
+    """
+
+    def __init__(
+        self,
+        configs: Iterable[JwtConfig],
+        active_kid: str,
+        default_kid: Optional[str] = None,
+    ):
+        self._configs: Dict[str, JwtConfig] = {}
+        for config in configs:
+            if config.kid is None:
+                raise ValueError("Keys in a key ring need a kid")
+            if config.kid in self._configs:
+                raise ValueError("Duplicate kid {}".format(config.kid))
+            config.verification_key
+            self._configs[config.kid] = config
+
+        for kid in (active_kid, default_kid):
+            if kid is not None and kid not in self._configs:
+                raise ValueError("Unknown kid {}".format(kid))
+        self.active_kid = active_kid
+        self.default_kid = default_kid
+
+    def __repr__(self) -> str:
+        return "JwtKeyRing(kids={}, active_kid={!r})".format(
+            list(self._configs), self.active_kid
+        )
+
+    @property
+    def kids(self):
+        return list(self._configs)
+
+    @property
+    def signing_config(self) -> JwtConfig:
+        return self._configs[self.active_kid]
+
+    def verification_config(self, kid: Optional[str]) -> JwtConfig:
+        if kid is None:
+            kid = self.default_kid
+            if kid is None:
+                raise UnknownKeyError("Token has no kid")
+        config = self._configs.get(kid)
+        if config is None:
+            raise UnknownKeyError("Unknown kid {}".format(kid))
+        return config
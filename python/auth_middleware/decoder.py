@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from dataclasses import MISSING, fields, is_dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable, Optional, Union, get_type_hints
+
+
+def _optional_arg(type_) -> Optional[Any]:
+    """
+    Return ``T`` for ``Optional[T]``, otherwise ``None``.
+    """
+    args = getattr(type_, "__args__", None)
+    if args is None:
+        return None
+    if getattr(type_, "__origin__", None) is Union and type(None) in args:
+        if len(args) == 2:
+            return args[0] if args[1] is type(None) else args[1]
+        return Any
+    return None
+
+
+def _decode_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    tz = datetime.now(timezone.utc).astimezone().tzinfo
+    return datetime.fromtimestamp(value, tz=tz)
+
+
+def _type_converter(type_) -> Optional[Callable[[Any], Any]]:
+    if isinstance(type_, type):
+        if issubclass(type_, Enum):
+            return type_
+        if issubclass(type_, datetime):
+            return _decode_datetime
+        if is_dataclass(type_):
+            return compile_decoder(type_)
+    return None
+
+
+def _field_converter(field, type_) -> Optional[Callable[[Any], Any]]:
+    inner = _optional_arg(type_)
+    optional = inner is not None
+    decoder = field.metadata.get("dataclasses_json", {}).get("decoder")
+
+    if decoder is not None:
+        # Values that already have the declared type (e.g. defaults) are passed
+        # through untouched, as dataclasses_json does.
+        def decode(value):
+            if value is None and not optional:
+                return value
+            if type(value) is type_:
+                return value
+            return decoder(value)
+
+        return decode
+
+    converter = _type_converter(inner if optional else type_)
+    if converter is None:
+        return None
+
+    def convert(value):
+        if value is None:
+            return value
+        return converter(value)
+
+    return convert
+
+
+def compile_decoder(cls) -> Callable[[dict], Any]:
+    """
+    Build a function that instantiates the dataclass ``cls`` directly from an
+    already parsed JSON object.
+
+    The result is equivalent to ``cls.from_json(json.dumps(data))`` for the
+    field types used in this package: field level ``dataclasses_json``
+    decoders, enums, datetimes and nested dataclasses. Unknown keys are
+    ignored and missing keys fall back to the field defaults.
+    """
+    hints = get_type_hints(cls)
+    specs = []
+    for field in fields(cls):
+        if not field.init:
+            continue
+        specs.append(
+            (
+                field.name,
+                field.default,
+                field.default_factory,  # type: ignore
+                _field_converter(field, hints[field.name]),
+            )
+        )
+    compiled = tuple(specs)
+
+    def decode(data: dict):
+        kwargs = {}
+        for name, default, default_factory, convert in compiled:
+            if name in data:
+                value = data[name]
+            elif default is not MISSING:
+                value = default
+            elif default_factory is not MISSING:
+                value = default_factory()
+            else:
+                raise KeyError(name)
+            kwargs[name] = value if convert is None else convert(value)
+        return cls(**kwargs)
+
+    decode.__name__ = "decode_{}".format(cls.__name__)
+    return decode
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict
+
+_encoders: Dict[type, Callable[[Any], dict]] = {}
+
+
+def _encode_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(v) for v in value]
+    if isinstance(value, dict):
+        return {
+            k: encoded
+            for k, encoded in ((k, _encode_value(v)) for k, v in value.items())
+            if encoded is not None
+        }
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if is_dataclass(value):
+        return encoder_for(type(value))(value)
+    return value
+
+
+def compile_encoder(cls) -> Callable[[Any], dict]:
+    """
+    Build a function that converts an instance of the dataclass ``cls`` into
+    a JSON compatible dict, leaving out ``None`` values.
+
+    The result is equivalent to ``clean_dict(json.loads(obj.to_json()))``
+    for the field types used in this package: field level
+    ``dataclasses_json`` encoders (which receive nested dataclasses as
+    dicts, as they do with dataclasses_json), enums, datetimes, lists and
+    nested dataclasses.
+    """
+    specs = tuple(
+        (field.name, field.metadata.get("dataclasses_json", {}).get("encoder"))
+        for field in fields(cls)
+    )
+
+    def encode(obj) -> dict:
+        data = {}
+        for name, field_encoder in specs:
+            value = _encode_value(getattr(obj, name))
+            if field_encoder is not None:
+                value = field_encoder(value)
+            if value is not None:
+                data[name] = value
+        return data
+
+    encode.__name__ = "encode_{}".format(cls.__name__)
+    return encode
+
+
+def encoder_for(cls) -> Callable[[Any], dict]:
+    encoder = _encoders.get(cls)
+    if encoder is None:
+        encoder = _encoders[cls] = compile_encoder(cls)
+    return encoder
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Hooks reporting where time goes when verifying tokens and checking
+permissions.
+
+    set_instrumentation(PrometheusInstrumentation())
+
+The default instrumentation is disabled: the hot paths check ``enabled``
+before taking any measurement.
+"""
+from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+from typing import Optional
+
+import jwt
+
+from .config import UnknownKeyError
+
+
+@dataclass(frozen=True)
+class PhaseTimings:
+    """
+    Seconds spent in each phase of ``Claim.from_token``: checking the
+    signature, parsing and validating the JSON payload, and decoding it into a
+    ``Claim`` (which only decodes the claim type when decoding lazily).
+    """
+
+    signature: float
+    parse: float
+    decode: float
+
+
+class Instrumentation:
+    """
+    Base class for instrumentations: override the hooks to report.
+    """
+
+    enabled = True
+
+    def token_verified(
+        self, timings: PhaseTimings, token_size: int, role_count: int
+    ) -> None:
+        pass
+
+    def token_rejected(self, reason: str, token_size: int) -> None:
+        """
+        ``reason`` is one of the values of ``rejection_reason``.
+        """
+
+    def cache_lookup(self, outcome: str) -> None:
+        """
+        ``outcome`` is ``"hit"``, ``"miss"`` or ``"expired"``.
+        """
+
+    def permission_checked(self, check: str, granted: bool, seconds: float) -> None:
+        """
+        ``check`` is the name of the ``Claim`` method, e.g.
+        ``"has_dataset_access"``.
+        """
+
+
+class NoopInstrumentation(Instrumentation):
+    enabled = False
+
+
+# The instrumentation in use. Read on every instrumented call, so it is a plain
+# module attribute; use `set_instrumentation` to replace it.
+current: Instrumentation = NoopInstrumentation()
+
+
+def set_instrumentation(instrumentation: Optional[Instrumentation]) -> None:
+    global current
+    current = NoopInstrumentation() if instrumentation is None else instrumentation
+
+
+def get_instrumentation() -> Instrumentation:
+    return current
+
+
+def rejection_reason(error: Exception) -> str:
+    # Subclasses first: InvalidSignatureError is a DecodeError, and all of
+    # these are InvalidTokenErrors.
+    if isinstance(error, jwt.ExpiredSignatureError):
+        return "expired"
+    if isinstance(error, jwt.ImmatureSignatureError):
+        return "not_yet_valid"
+    if isinstance(error, jwt.InvalidSignatureError):
+        return "invalid_signature"
+    if isinstance(error, UnknownKeyError):
+        return "unknown_key"
+    if isinstance(error, jwt.InvalidAlgorithmError):
+        return "invalid_algorithm"
+    if isinstance(error, jwt.DecodeError):
+        return "malformed"
+    if isinstance(error, jwt.PyJWTError):
+        return "invalid_token"
+    return "invalid_claim"
+
+
+def instrumented_check(func):
+    """
+    Report the calls of a permission check method to the instrumentation.
+    """
+    check = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        instrumentation = current
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+        start = perf_counter()
+        granted = func(*args, **kwargs)
+        instrumentation.permission_checked(
+            check, bool(granted), perf_counter() - start
+        )
+        return granted
+
+    return wrapper
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """
+    Reports to ``prometheus_client`` metrics named ``<prefix>_...``, registered
+    in ``registry`` (the default registry if ``None``).
+    """
+
+    def __init__(self, registry=None, prefix: str = "auth_middleware"):
+        from prometheus_client import REGISTRY, Counter, Histogram
+
+        registry = REGISTRY if registry is None else registry
+        self.phase_seconds = Histogram(
+            prefix + "_token_phase_seconds",
+            "Time spent verifying and decoding tokens, by phase",
+            ["phase"],
+            registry=registry,
+            buckets=(1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2, 0.1),
+        )
+        self.token_bytes = Histogram(
+            prefix + "_token_size_bytes",
+            "Size of the verified tokens",
+            registry=registry,
+            buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 65536, 262144),
+        )
+        self.token_roles = Histogram(
+            prefix + "_token_roles",
+            "Number of roles in the verified tokens",
+            registry=registry,
+            buckets=(1, 2, 5, 10, 50, 100, 500, 1000, 5000),
+        )
+        self.rejected = Counter(
+            prefix + "_tokens_rejected_total",
+            "Tokens that failed verification, by reason",
+            ["reason"],
+            registry=registry,
+        )
+        self.cache_lookups = Counter(
+            prefix + "_cache_lookups_total",
+            "Claim cache lookups, by outcome",
+            ["outcome"],
+            registry=registry,
+        )
+        self.permission_checks = Counter(
+            prefix + "_permission_checks_total",
+            "Permission checks, by method and result",
+            ["check", "granted"],
+            registry=registry,
+        )
+        self.permission_seconds = Histogram(
+            prefix + "_permission_check_seconds",
+            "Time spent in permission checks, by method",
+            ["check"],
+            registry=registry,
+            buckets=(1e-7, 2.5e-7, 5e-7, 1e-6, 2.5e-6, 5e-6, 1e-5, 1e-4, 1e-3),
+        )
+
+    def token_verified(
+        self, timings: PhaseTimings, token_size: int, role_count: int
+    ) -> None:
+        self.phase_seconds.labels("signature").observe(timings.signature)
+        self.phase_seconds.labels("parse").observe(timings.parse)
+        self.phase_seconds.labels("decode").observe(timings.decode)
+        self.token_bytes.observe(token_size)
+        self.token_roles.observe(role_count)
+
+    def token_rejected(self, reason: str, token_size: int) -> None:
+        self.rejected.labels(reason).inc()
+
+    def cache_lookup(self, outcome: str) -> None:
+        self.cache_lookups.labels(outcome).inc()
+
+    def permission_checked(self, check: str, granted: bool, seconds: float) -> None:
+        self.permission_checks.labels(check, str(granted).lower()).inc()
+        self.permission_seconds.labels(check).observe(seconds)
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Reports to OpenTelemetry metrics created from ``meter`` (the
+    ``auth_middleware`` meter of the global meter provider if ``None``).
+    """
+
+    def __init__(self, meter=None):
+        if meter is None:
+            from opentelemetry import metrics
+
+            meter = metrics.get_meter("auth_middleware")
+
+        self.phase_duration = meter.create_histogram(
+            "auth_middleware.token.phase.duration",
+            unit="s",
+            description="Time spent verifying and decoding tokens, by phase",
+        )
+        self.token_size = meter.create_histogram(
+            "auth_middleware.token.size", unit="By", description="Token size"
+        )
+        self.token_roles = meter.create_histogram(
+            "auth_middleware.token.roles", description="Number of roles in tokens"
+        )
+        self.rejected = meter.create_counter(
+            "auth_middleware.token.rejected",
+            description="Tokens that failed verification, by reason",
+        )
+        self.cache_lookups = meter.create_counter(
+            "auth_middleware.cache.lookups",
+            description="Claim cache lookups, by outcome",
+        )
+        self.permission_duration = meter.create_histogram(
+            "auth_middleware.permission_check.duration",
+            unit="s",
+            description="Time spent in permission checks, by method and result",
+        )
+
+    def token_verified(
+        self, timings: PhaseTimings, token_size: int, role_count: int
+    ) -> None:
+        self.phase_duration.record(timings.signature, {"phase": "signature"})
+        self.phase_duration.record(timings.parse, {"phase": "parse"})
+        self.phase_duration.record(timings.decode, {"phase": "decode"})
+        self.token_size.record(token_size)
+        self.token_roles.record(role_count)
+
+    def token_rejected(self, reason: str, token_size: int) -> None:
+        self.rejected.add(1, {"reason": reason})
+
+    def cache_lookup(self, outcome: str) -> None:
+        self.cache_lookups.add(1, {"outcome": outcome})
+
+    def permission_checked(self, check: str, granted: bool, seconds: float) -> None:
+        self.permission_duration.record(seconds, {"check": check, "granted": granted})
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+JSON parsing and serialization of claim payloads.
+
+``Claim.from_token`` parses verified payloads, and ``Claim.encode`` serializes
+claims, with the fastest library installed: ``orjson``, then ``ujson``, then
+the standard library. Either library gives the same results as the standard
+library: documents they reject (such as ``NaN`` or integers out of their
+range) are handed over to ``json``, and so are values they would serialize
+differently (non-ASCII strings, which ``json`` escapes).
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union
+
+BACKENDS = ("orjson", "ujson", "json")
+
+
+@dataclass(frozen=True)
+class JsonBackend:
+    name: str
+    # Parse a JSON document, raising ValueError if it is invalid
+    loads: Callable[[Union[bytes, str]], Any]
+    # Serialize to JSON without whitespace, escaping non-ASCII characters
+    dumps: Callable[[Any], str]
+
+
+def _json_dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _orjson_backend() -> JsonBackend:
+    import orjson
+
+    # Values `json` cannot serialize raise TypeError, as with `json`
+    option = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def dumps(value) -> str:
+        try:
+            encoded = orjson.dumps(value, option=option)
+        except TypeError:
+            # Also raised for integers over 64 bits and non-str keys
+            return _json_dumps(value)
+        if encoded.isascii():
+            return encoded.decode("ascii")
+        return _json_dumps(value)
+
+    return JsonBackend("orjson", loads, dumps)
+
+
+def _ujson_backend() -> JsonBackend:
+    import ujson
+
+    def loads(data):
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            return json.loads(data)
+
+    def dumps(value) -> str:
+        try:
+            return ujson.dumps(value, ensure_ascii=True, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return _json_dumps(value)
+
+    return JsonBackend("ujson", loads, dumps)
+
+
+def _stdlib_backend() -> JsonBackend:
+    return JsonBackend("json", json.loads, _json_dumps)
+
+
+_factories = {
+    "orjson": _orjson_backend,
+    "ujson": _ujson_backend,
+    "json": _stdlib_backend,
+}
+
+
+def load_backend(name: Optional[str] = None) -> JsonBackend:
+    """
+    The backend ``name`` (one of ``BACKENDS``), or the first installed one.
+    Raises ImportError if the library of ``name`` is not installed.
+    """
+    if name is not None:
+        if name not in _factories:
+            raise ValueError(
+                "Unknown JSON backend {!r}, expected one of {}".format(
+                    name, ", ".join(BACKENDS)
+                )
+            )
+        return _factories[name]()
+    for factory in (_orjson_backend, _ujson_backend):
+        try:
+            return factory()
+        except ImportError:
+            pass
+    return _stdlib_backend()
+
+
+_backend: JsonBackend = load_backend()
+
+
+def set_json_backend(name: Optional[str]) -> None:
+    """
+    Use the backend ``name`` for claim payloads, or the fastest installed one
+    with ``None``.
+    """
+    global _backend
+    _backend = load_backend(name)
+
+
+def get_json_backend() -> JsonBackend:
+    return _backend
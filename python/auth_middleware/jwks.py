@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from jwt.algorithms import get_default_algorithms
+from jwt.exceptions import InvalidKeyError
+
+from .config import JwtConfig, UnknownKeyError
+
+_algorithms = get_default_algorithms()
+
+# Algorithm used for keys that don't specify one with "alg"
+_default_algorithms: Dict[Tuple[Optional[str], Optional[str]], str] = {
+    ("RSA", None): "RS256",
+    ("EC", "P-256"): "ES256",
+    ("EC", "P-384"): "ES384",
+    ("EC", "P-521"): "ES512",
+    ("OKP", "Ed25519"): "EdDSA",
+    ("OKP", "Ed448"): "EdDSA",
+    ("oct", None): "HS256",
+}
+
+Document = Union[str, bytes, dict]
+
+
+def _load_key(jwk: dict) -> Optional[JwtConfig]:
+    """
+    The verification config for a JWK, or ``None`` for keys that cannot verify
+    tokens (no kid, encryption keys, unsupported key types).
+    """
+    kid = jwk.get("kid")
+    if not isinstance(kid, str) or jwk.get("use", "sig") != "sig":
+        return None
+    algorithm = jwk.get("alg") or _default_algorithms.get(
+        (jwk.get("kty"), jwk.get("crv"))
+    )
+    if not isinstance(algorithm, str) or algorithm not in _algorithms:
+        return None
+    try:
+        key = _algorithms[algorithm].from_jwk(json.dumps(jwk))
+    except (InvalidKeyError, NotImplementedError, ValueError, KeyError, TypeError):
+        return None
+    config = JwtConfig(key, algorithm=algorithm, kid=kid)
+    config.verification_key
+    return config
+
+
+def parse_jwks(document: Document) -> Dict[str, JwtConfig]:
+    """
+    Index the keys of a JWKS document by ``kid``. Keys that cannot be used to
+    verify tokens are skipped.
+    """
+    if not isinstance(document, dict):
+        document = json.loads(document)
+    keys = document.get("keys")  # type: ignore
+    if not isinstance(keys, list):
+        raise ValueError("Invalid JWKS document: no keys")
+
+    configs: Dict[str, JwtConfig] = {}
+    for jwk in keys:
+        if isinstance(jwk, dict):
+            config = _load_key(jwk)
+            if config is not None:
+                configs.setdefault(config.kid, config)  # type: ignore
+    return configs
+
+
+class JwksKeySource:
+    """
+    Verification keys loaded from a JWKS document, indexed by ``kid``.
+
+    ``fetch`` returns the document, as JSON text or already parsed. It is
+    called once when the source is created, and then from a background thread
+    every ``refresh_interval`` seconds, randomly spread by ``jitter`` (a
+    fraction of the interval) so that services started together don't refresh
+    together. Lookups only read the current index and never wait for a fetch:
+    tokens with an unknown ``kid`` are rejected at once, and trigger a refresh
+    in the background, at most every ``min_refresh_interval`` seconds.
+
+    A key source can be used wherever a ``JwtConfig`` is expected by
+    ``Claim.from_token``. It can only verify tokens.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Document],
+        refresh_interval: float = 300.0,
+        jitter: float = 0.1,
+        min_refresh_interval: float = 30.0,
+        background: bool = True,
+    ):
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be between 0 and 1")
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.jitter = jitter
+        self.min_refresh_interval = min_refresh_interval
+        self._configs: Dict[str, JwtConfig] = {}
+        self._lock = threading.Lock()
+        self._last_refresh = float("-inf")
+        self._stopped = threading.Event()
+        # Set to refresh the keys without waiting for the next interval
+        self._wakeup = threading.Event()
+        self.refresh()
+
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(
+                target=self._run, name="jwks-refresh", daemon=True
+            )
+            self._thread.start()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "JwksKeySource":
+        def fetch() -> str:
+            with open(path) as f:
+                return f.read()
+
+        return cls(fetch, **kwargs)
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 5.0, **kwargs) -> "JwksKeySource":
+        def fetch() -> bytes:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.read()
+
+        return cls(fetch, **kwargs)
+
+    def __enter__(self) -> "JwksKeySource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return "JwksKeySource(kids={})".format(self.kids)
+
+    @property
+    def kids(self):
+        return list(self._configs)
+
+    def refresh(self) -> None:
+        """
+        Fetch the document and replace the index. On failure the current keys
+        are kept and the exception is raised.
+        """
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        self._last_refresh = time.monotonic()
+        # Replaced as a whole, so that lookups never see a partial index.
+        self._configs = parse_jwks(self.fetch())
+
+    def _request_refresh(self) -> None:
+        """
+        Refresh the keys in the background, unless they were refreshed less
+        than ``min_refresh_interval`` seconds ago. Never waits.
+        """
+        if not self._lock.acquire(blocking=False):
+            # A refresh is already in progress
+            return
+        try:
+            now = time.monotonic()
+            if now - self._last_refresh < self.min_refresh_interval:
+                return
+            # Taken now, so that other lookups don't request another refresh
+            self._last_refresh = now
+        finally:
+            self._lock.release()
+
+        if self._thread is not None:
+            self._wakeup.set()
+        else:
+            threading.Thread(
+                target=self._try_refresh, name="jwks-refresh", daemon=True
+            ).start()
+
+    def _try_refresh(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            # Keep the current keys until the next attempt
+            pass
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._next_delay())
+            if self._stopped.is_set():
+                return
+            self._wakeup.clear()
+            self._try_refresh()
+
+    def _next_delay(self) -> float:
+        spread = self.refresh_interval * self.jitter
+        return self.refresh_interval + random.uniform(-spread, spread)
+
+    def close(self) -> None:
+        """
+        Stop refreshing in the background.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def signing_config(self) -> JwtConfig:
+        raise ValueError("A JWKS key source can only verify tokens")
+
+    def verification_config(self, kid: Optional[str]) -> JwtConfig:
+        if kid is None:
+            raise UnknownKeyError("Token has no kid")
+        config = self._configs.get(kid)
+        if config is None:
+            self._request_refresh()
+            raise UnknownKeyError("Unknown kid {}".format(kid))
+        return config
@@ -1,19 +1,59 @@
 from enum import Enum
-from typing import List
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+M = TypeVar("M", bound="ModelType")
 
 
 class ModelType(Enum):
+    # The collections below are computed once per enum class and stored on the
+    # class itself (not inherited), since they are used on every decode.
+
+    @classmethod
+    def members(cls) -> Tuple:
+        members = cls.__dict__.get("_members_cache")
+        if members is None:
+            members = tuple(t for t in cls if isinstance(t, cls))
+            setattr(cls, "_members_cache", members)
+        return members
+
+    @classmethod
+    def values(cls) -> Tuple:
+        values = cls.__dict__.get("_values_cache")
+        if values is None:
+            values = tuple(t.value for t in cls.members())
+            setattr(cls, "_values_cache", values)
+        return values
+
     @classmethod
-    def values(cls):
-        return [t.value for t in cls if isinstance(t, cls)]
+    def value_set(cls) -> FrozenSet:
+        value_set = cls.__dict__.get("_value_set_cache")
+        if value_set is None:
+            value_set = frozenset(cls.values())
+            setattr(cls, "_value_set_cache", value_set)
+        return value_set
 
     @classmethod
-    def members(cls):
-        return [t for t in cls if isinstance(t, cls)]
+    def from_value_or_none(cls: Type[M], value) -> Optional[M]:
+        try:
+            return cls._value2member_map_.get(value)  # type: ignore
+        except TypeError:
+            return None
 
 
 class Permission(ModelType):
-    pass
+    @property
+    def mask(self) -> int:
+        return _permission_bits[self]
 
 
 class OrganizationLevelPermission(Permission):
@@ -81,13 +121,17 @@ class RoleType(ModelType):
 
     @property
     def permissions(self):
-        return RoleType.role_permissions()[self]
+        return list(_role_permissions[self])
+
+    @property
+    def mask(self) -> int:
+        return _role_masks[self]
 
     def has_permission(self, permission: Permission):
-        return permission in self.permissions
+        return _role_masks[self] & _permission_bits.get(permission, 0) != 0
 
     def has_permissions(self, permissions: List[Permission]):
-        return all([self.has_permission(permission) for permission in permissions])
+        return permissions_in_mask(_role_masks[self], permissions)
 
     @classmethod
     def role_permissions(cls):
@@ -147,6 +191,53 @@ class RoleType(ModelType):
         }
 
 
+# Every permission is assigned a bit, in definition order, and every role type
+# the mask of the permissions it grants. Both are computed once at import so
+# that permission checks are a single bitwise AND.
+_permission_bits: Dict[Permission, int] = {
+    permission: 1 << index
+    for index, permission in enumerate(
+        member for cls in Permission.__subclasses__() for member in cls.members()
+    )
+}
+
+
+def permission_mask(permissions: Iterable[Permission]) -> int:
+    """
+    Combine ``permissions`` into a single bit mask.
+    """
+    mask = 0
+    for permission in permissions:
+        mask |= _permission_bits[permission]
+    return mask
+
+
+def permissions_in_mask(
+    mask: int, permissions: Union[int, Iterable[Permission]]
+) -> bool:
+    """
+    Check that every permission in ``permissions`` (or in a mask previously
+    built with ``permission_mask``) is granted by ``mask``.
+    """
+    if not isinstance(permissions, int):
+        try:
+            permissions = permission_mask(permissions)
+        except KeyError:
+            return False
+    return mask & permissions == permissions
+
+
+_role_permissions: Dict[RoleType, Tuple[Permission, ...]] = {
+    role: tuple(permissions)
+    for role, permissions in RoleType.role_permissions().items()
+}
+
+_role_masks: Dict[RoleType, int] = {
+    role: permission_mask(permissions)
+    for role, permissions in _role_permissions.items()
+}
+
+
 class FeatureFlag(ModelType):
     TIME_SERIES_EVENTS_FEATURE = "time_series_events_feature"
     VIEWER2_FEATURE = "viewer2_feature"
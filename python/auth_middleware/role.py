@@ -1,46 +1,129 @@
-from typing import Optional, List
-from dataclasses import dataclass, field
-from dataclasses_json import dataclass_json
-import json
+import threading
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, fields
+from .decoder import compile_decoder
+from .utils import lazy_dataclass_json, with_slots
 from .models import FeatureFlag, RoleType, Permission, Role as PennsieveRole
 
 
-@dataclass
+# Ids below this value, and the "*" wildcard, are created once per id type and
+# shared.
+_SMALL_IDS = 1024
+
+
+@with_slots
+@dataclass(frozen=True, init=False)
 class Id:
+    """
+    Immutable id value. Construction parses ``value`` once: ints and digit
+    strings give ``id``, anything else (such as the ``"*"`` wildcard) gives
+    ``id == -1`` and is kept as ``wildcard``.
+    """
+
     id: int = -1
     wildcard: str = ""
 
-    def __init__(self, value):
+    # Shared instances, per id type (see `__init_subclass__`)
+    _instances: ClassVar[Dict[Any, "Id"]] = {}
+
+    def __init_subclass__(cls):
+        cls._instances = {}
+
+    def __new__(cls, value):
+        instance = cls._instances.get(value)
+        if instance is not None:
+            return instance
         if isinstance(value, int):
-            self.id = value
+            id_, wildcard = int(value), ""
         elif value.isdigit():
-            self.id = int(value)
+            id_, wildcard = int(value), ""
+            # Only cached under their int: the strings come from requests, and
+            # "1", "01", "001"... would each add an entry.
+            instance = cls._instances.get(id_)
+            if instance is not None:
+                return instance
         else:
-            self.wildcard = value
+            id_, wildcard = -1, value
+
+        instance = object.__new__(cls)
+        _set_id(instance, id_)
+        _set_wildcard(instance, wildcard)
+        if wildcard == "*":
+            instance = cls._instances.setdefault("*", instance)
+        elif not wildcard and 0 <= id_ < _SMALL_IDS:
+            instance = cls._instances.setdefault(id_, instance)
+        return instance
+
+    @classmethod
+    def from_int(cls, value: int):
+        """
+        Same as ``cls(value)`` for an ``int``, without parsing.
+        """
+        instance = cls._instances.get(value)
+        if instance is None:
+            instance = object.__new__(cls)
+            _set_id(instance, value)
+            _set_wildcard(instance, "")
+            if 0 <= value < _SMALL_IDS:
+                cls._instances[value] = instance
+        return instance
+
+    def __reduce__(self):
+        return type(self), (self.wildcard or self.id,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __eq__(self, other) -> bool:
-        return type(other) is type(self) and other.id == self.id
+        return self is other or (type(other) is type(self) and other.id == self.id)
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.id))
 
     def matches(self, other: "Id") -> bool:
-        return self == other or (
-            (type(self) is type(other))
-            and (self.wildcard == "*" or self.wildcard == "*")
+        """
+        Whether ``other`` is this id or, if this id is the ``*`` wildcard, any
+        id of the same type.
+        """
+        return type(self) is type(other) and (
+            self.wildcard == "*" or other.id == self.id
         )
 
 
+# Frozen: fields are set through their slot descriptors
+_set_id = Id.__dict__["id"].__set__
+_set_wildcard = Id.__dict__["wildcard"].__set__
+
+
 class DatasetId(Id):
-    pass
+    __slots__ = ()
 
 
 class OrganizationId(Id):
-    pass
+    __slots__ = ()
 
 
 class WorkspaceId(Id):
-    pass
+    __slots__ = ()
+
+
+def id_value(value) -> int:
+    """
+    The ``id`` of ``Id(value)`` for a raw id from a payload or a request, or of
+    ``value`` itself if it is already an ``Id``.
+    """
+    if isinstance(value, Id):
+        return value.id
+    if isinstance(value, int):
+        return value
+    return int(value) if value.isdigit() else -1
 
 
-@dataclass
+@with_slots
+@dataclass(frozen=True)
 class Role:
     role: RoleType
     node_id: Optional[str] = None
@@ -51,6 +134,10 @@ class Role:
     def permissions(self) -> List[Permission]:
         return self.role.permissions
 
+    @property
+    def mask(self) -> int:
+        return self.role.mask
+
     def has_permission(self, permission: Permission) -> bool:
         return self.role.has_permission(permission)
 
@@ -58,31 +145,40 @@ class Role:
         return self.role.has_permissions(permissions)
 
 
+def _supported_features(flags) -> Tuple[FeatureFlag, ...]:
+    # Flags unknown to this version of the library are dropped.
+    return tuple(
+        feature
+        for feature in map(FeatureFlag.from_value_or_none, flags)
+        if feature is not None
+    )
+
+
 # Provide a metadata dict for the id field with custom hooks for dataclass_json
 # to use when encoding/decoding the values, because the raw json doesn't exactly
 # reflect the object structure we want to use.
 
 
-@dataclass_json
-@dataclass
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class OrganizationRole(Role):
     id: OrganizationId = field(
         default=OrganizationId(-1),
         metadata={
             "dataclasses_json": {
-                "decoder": lambda x: OrganizationId(x),
+                "decoder": OrganizationId,
                 "encoder": lambda x: x["wildcard"] if x["wildcard"] else x["id"],
             }
         },
     )
     type: PennsieveRole = PennsieveRole.ORGANIZATION_ROLE
-    enabled_features: Optional[List[FeatureFlag]] = field(
+    # A tuple (lists are converted), so that roles stay immutable and hashable
+    enabled_features: Optional[Tuple[FeatureFlag, ...]] = field(
         default=None,
         metadata={
             "dataclasses_json": {
-                "decoder": lambda flags: [
-                    FeatureFlag(flag) for flag in flags if flag in FeatureFlag.values()
-                ]
+                "decoder": lambda flags: _supported_features(flags)
                 if flags is not None
                 else None
             }
@@ -90,15 +186,21 @@ class OrganizationRole(Role):
     )
     encryption_key_id: Optional[str] = None
 
+    def __post_init__(self):
+        features = self.enabled_features
+        if features is not None and type(features) is not tuple:
+            object.__setattr__(self, "enabled_features", tuple(features))
 
-@dataclass_json
-@dataclass
+
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class DatasetRole(Role):
     id: DatasetId = field(
         default=DatasetId(-1),
         metadata={
             "dataclasses_json": {
-                "decoder": lambda x: DatasetId(x),
+                "decoder": DatasetId,
                 "encoder": lambda x: x["id"],
             }
         },
@@ -107,14 +209,15 @@ class DatasetRole(Role):
     type: PennsieveRole = PennsieveRole.DATASET_ROLE
 
 
-@dataclass_json
-@dataclass
+@lazy_dataclass_json
+@with_slots
+@dataclass(frozen=True)
 class WorkspaceRole(Role):
     id: WorkspaceId = field(
         default=WorkspaceId(-1),
         metadata={
             "dataclasses_json": {
-                "decoder": lambda x: WorkspaceId(x),
+                "decoder": WorkspaceId,
                 "encoder": lambda x: x["id"],
             }
         },
@@ -122,10 +225,325 @@ class WorkspaceRole(Role):
     type: PennsieveRole = PennsieveRole.WORKSPACE_ROLE
 
 
+_role_decoders = {
+    "organization_role": compile_decoder(OrganizationRole),
+    "dataset_role": compile_decoder(DatasetRole),
+    "workspace_role": compile_decoder(WorkspaceRole),
+}
+
+_role_id_types = {
+    "organization_role": OrganizationId,
+    "dataset_role": DatasetId,
+    "workspace_role": WorkspaceId,
+}
+
+
+_MISSING = object()
+
+# The fields read by the decoder of each role type, in a fixed order
+_role_fields = {
+    type_: tuple(f.name for f in fields(cls) if f.init)
+    for type_, cls in (
+        ("organization_role", OrganizationRole),
+        ("dataset_role", DatasetRole),
+        ("workspace_role", WorkspaceRole),
+    )
+}
+
+
+class RoleInternPool:
+    """
+    Bounded pool of decoded roles, keyed by their payload, so that identical
+    roles in different claims (typically organization roles) are decoded once
+    and share a single instance.
+
+    Roles are immutable, ``enabled_features`` included (a tuple), so sharing
+    them is safe. When the pool is full, the oldest entries are evicted first.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self._roles: Dict[tuple, Role] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._roles)
+
+    def clear(self) -> None:
+        self._roles.clear()
+
+    def decode(self, data: dict) -> Role:
+        type_ = data["type"]
+        names = _role_fields[type_]
+        values = []
+        for name in names:
+            value = data.get(name, _MISSING)
+            # With their types, so that equal values of different JSON types
+            # (1, 1.0 and true) are not mistaken for one another
+            if type(value) is list:
+                value = tuple((type(item), item) for item in value)
+            values.append((type(value), value))
+        key = (type_, *values)
+        try:
+            role = self._roles.get(key)
+        except TypeError:
+            # Unhashable values: decode without interning
+            return _role_decoders[type_](data)
+        if role is not None:
+            self.hits += 1
+            return role
+
+        self.misses += 1
+        role = _role_decoders[type_](data)
+        roles = self._roles
+        if len(roles) >= self.maxsize:
+            # Dicts preserve insertion order: evict the oldest entry
+            try:
+                roles.pop(next(iter(roles)), None)
+            except (StopIteration, RuntimeError):
+                pass
+        roles[key] = role
+        return role
+
+
+_pool: Optional[RoleInternPool] = RoleInternPool()
+
+
+def set_role_intern_pool(pool: Optional[RoleInternPool]) -> None:
+    """
+    Replace the pool used by ``role_from_dict``, or disable interning with
+    ``None``.
+    """
+    global _pool
+    _pool = pool
+
+
+def get_role_intern_pool() -> Optional[RoleInternPool]:
+    return _pool
+
+
+def _decode_role(data: dict) -> Role:
+    pool = _pool
+    if pool is None:
+        return _role_decoders[data["type"]](data)
+    return pool.decode(data)
+
+
 def role_from_dict(data):
-    roles = {
-        "organization_role": OrganizationRole,
-        "dataset_role": DatasetRole,
-        "workspace_role": WorkspaceRole,
-    }
-    return [roles[role["type"]].from_json(json.dumps(role)) for role in data]
+    return [_decode_role(role) for role in data]
+
+
+class RoleIndex:
+    """
+    Lookup tables over the roles of a claim.
+
+    Lookups return the same roles as a linear scan would: an exact id match
+    takes precedence, otherwise the first ``*`` wildcard role with the same id
+    type is used. The index assumes that the list of roles is not modified
+    after it has been built.
+
+    An index built with ``from_payload`` is keyed from the raw role dicts and
+    only decodes a role the first time it is returned.
+    """
+
+    def __init__(self, roles: List[Role]):
+        self._decoded: List[Optional[Role]] = roles  # type: ignore
+        self._payload: Optional[List[dict]] = None
+        self._lazy_roles: Optional[LazyRoleList] = None
+        self._build(
+            (type(role.id), role.id.id, role.id.wildcard, role.type) for role in roles
+        )
+
+    @classmethod
+    def from_payload(cls, data: List[dict]) -> "RoleIndex":
+        index = cls.__new__(cls)
+        index._decoded = [None] * len(data)
+        index._payload = data
+        index._lazy_roles = None
+        index._build(_payload_key(role) for role in data)
+        return index
+
+    def _build(self, keys) -> None:
+        self._by_id: Dict[Tuple[type, int], List[int]] = {}
+        self._wildcards: Dict[type, int] = {}
+        self._by_type: Dict[PennsieveRole, List[int]] = {}
+        self._masks: Dict[type, Tuple[Dict[int, int], Optional[int]]] = {}
+
+        position = -1
+        for position, (id_type, id_, wildcard, role_type) in enumerate(keys):
+            self._by_id.setdefault((id_type, id_), []).append(position)
+            if wildcard == "*" and id_type not in self._wildcards:
+                self._wildcards[id_type] = position
+            self._by_type.setdefault(role_type, []).append(position)
+        self.size = position + 1
+
+    def _role(self, position: int) -> Role:
+        role = self._decoded[position]
+        if role is None:
+            payload = self._payload
+            if payload is None:
+                # `roles` decoded every role in another thread meanwhile
+                return self._decoded[position]  # type: ignore
+            role = _decode_role(payload[position])
+            self._decoded[position] = role
+        return role
+
+    @property
+    def roles(self) -> List[Role]:
+        if self._payload is not None:
+            for position in range(self.size):
+                self._role(position)
+            # Only once every role is decoded, see `_role`
+            self._payload = None
+        return self._decoded  # type: ignore
+
+    def lazy_roles(self) -> "LazyRoleList":
+        """
+        The roles as a list that is only decoded when it is used, for the
+        content of a lazily decoded claim. The index stays current for it.
+        """
+        if self._lazy_roles is None:
+            self._lazy_roles = LazyRoleList(index=self)
+        return self._lazy_roles
+
+    def is_current(self, roles: List[Role]) -> bool:
+        if roles is not self._decoded and roles is not self._lazy_roles:
+            return False
+        return len(roles) == self.size
+
+    def get(self, role_id: Id) -> Optional[Role]:
+        if not isinstance(role_id, Id):
+            return None
+        matches = self._by_id.get((type(role_id), role_id.id))
+        if matches:
+            return self._role(matches[0])
+        wildcard = self._wildcards.get(type(role_id))
+        return None if wildcard is None else self._role(wildcard)
+
+    def masks(self, id_type: type) -> Tuple[Dict[int, int], Optional[int]]:
+        """
+        The permission masks of the roles ``get`` returns for ids of
+        ``id_type``: by ``id``, and for any other id (``None`` if there is no
+        wildcard role). Computed once per id type.
+        """
+        masks = self._masks.get(id_type)
+        if masks is None:
+            by_id = {
+                id_: self._role(positions[0]).mask
+                for (type_, id_), positions in self._by_id.items()
+                if type_ is id_type
+            }
+            wildcard = self._wildcards.get(id_type)
+            masks = (by_id, None if wildcard is None else self._role(wildcard).mask)
+            self._masks[id_type] = masks
+        return masks
+
+    def get_exact(self, role_id: Id, role_type: PennsieveRole) -> Optional[Role]:
+        if not isinstance(role_id, Id):
+            return None
+        for position in self._by_id.get((type(role_id), role_id.id), ()):
+            role = self._role(position)
+            if role.type == role_type:
+                return role
+        return None
+
+    def of_type(self, role_type: PennsieveRole) -> List[Role]:
+        return [self._role(position) for position in self._by_type.get(role_type, ())]
+
+    def first_of_type(self, role_type: PennsieveRole) -> Optional[Role]:
+        positions = self._by_type.get(role_type)
+        return self._role(positions[0]) if positions else None
+
+
+def _payload_key(data: dict) -> Tuple[type, int, str, PennsieveRole]:
+    # Mirrors what decoding the role would produce for its id and type.
+    id_type = _role_id_types[data["type"]]
+    role_id = id_type(data["id"]) if "id" in data else id_type(-1)
+    return id_type, role_id.id, role_id.wildcard, PennsieveRole(data["type"])
+
+
+def _decoding(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args):
+        self._decode()
+        return method(self, *args)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+class LazyRoleList(list):
+    """
+    The roles of a ``RoleIndex``, as a list that decodes them the first time
+    it is used. Its length and single items are answered by the index without
+    decoding the other roles.
+    """
+
+    __slots__ = ("_index",)
+    _lock = threading.Lock()
+
+    def __init__(self, roles=(), index: Optional[RoleIndex] = None):
+        super().__init__(roles)
+        self._index = index
+
+    def _decode(self) -> None:
+        index = self._index
+        if index is not None:
+            roles = index.roles
+            with self._lock:
+                if self._index is not None:
+                    list.extend(self, roles)
+                    self._index = None
+
+    def __len__(self) -> int:
+        index = self._index
+        return index.size if index is not None else list.__len__(self)
+
+    def __getitem__(self, item):
+        index = self._index
+        if index is not None and type(item) is int:
+            return index._role(range(index.size)[item])
+        self._decode()
+        return list.__getitem__(self, item)
+
+    def __reduce_ex__(self, protocol):
+        # Copied and pickled as a plain list
+        return list, (list(self),)
+
+
+for _name in (
+    "__iter__",
+    "__reversed__",
+    "__contains__",
+    "__repr__",
+    "__eq__",
+    "__ne__",
+    "__lt__",
+    "__le__",
+    "__gt__",
+    "__ge__",
+    "__add__",
+    "__iadd__",
+    "__mul__",
+    "__rmul__",
+    "__imul__",
+    "__setitem__",
+    "__delitem__",
+    "__sizeof__",
+    "append",
+    "extend",
+    "insert",
+    "pop",
+    "remove",
+    "clear",
+    "index",
+    "count",
+    "copy",
+    "reverse",
+    "sort",
+):
+    setattr(LazyRoleList, _name, _decoding(_name))
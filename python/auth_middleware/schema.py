@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Structural validation of claim payloads.
+
+``Claim.from_token`` checks the size of tokens before verifying them, and the
+structure of their payload right after, so that malformed or oversized claims
+are rejected before any dataclass is built. The checks are compiled once from
+the claim and role dataclasses: required fields, JSON types, enum values and
+the claim and role ``type`` discriminators.
+"""
+from dataclasses import MISSING, fields, is_dataclass
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Set, Tuple, Union, get_type_hints
+
+from .compact import expand_payload, is_compact
+from .role import DatasetRole, Id, OrganizationRole, WorkspaceRole
+
+NoneType = type(None)
+_MISSING = object()
+
+# (name, required, allowed JSON types or None if unchecked, allowed values or
+# None if unchecked)
+FieldSpec = Tuple[str, bool, Optional[FrozenSet[type]], Optional[FrozenSet]]
+
+
+class InvalidClaimError(ValueError):
+    """
+    The token or its payload does not have the structure of a claim.
+    """
+
+
+def _json_types(type_) -> Optional[FrozenSet[type]]:
+    """
+    The types ``json.loads`` produces for values that decode to ``type_``.
+    """
+    if type_ is NoneType:
+        return frozenset((NoneType,))
+    if getattr(type_, "__origin__", None) is Union:
+        allowed: Set[type] = set()
+        for arg in type_.__args__:
+            arg_types = _json_types(arg)
+            if arg_types is None:
+                return None
+            allowed.update(arg_types)
+        return frozenset(allowed)
+    if getattr(type_, "__origin__", None) in (list, tuple):
+        return frozenset((list,))
+    if not isinstance(type_, type):
+        return None
+    if issubclass(type_, Id):
+        return frozenset((int, str))
+    if issubclass(type_, Enum):
+        return frozenset((str,))
+    if issubclass(type_, datetime):
+        return frozenset((int, float))
+    if is_dataclass(type_):
+        return frozenset((dict,))
+    for json_type in (bool, int, float, str):
+        if issubclass(type_, json_type):
+            return frozenset((json_type,))
+    return None
+
+
+def _enum_values(type_) -> Optional[FrozenSet]:
+    if getattr(type_, "__origin__", None) is Union:
+        enums = [arg for arg in type_.__args__ if arg is not NoneType]
+        if len(enums) != 1:
+            return None
+        type_ = enums[0]
+        optional = True
+    else:
+        optional = False
+    if isinstance(type_, type) and issubclass(type_, Enum):
+        values = frozenset(member.value for member in type_)
+        return values | {None} if optional else values
+    return None
+
+
+def _compile(cls) -> Tuple[FieldSpec, ...]:
+    hints = get_type_hints(cls)
+    specs = []
+    for field in fields(cls):
+        # `type` is the discriminator, checked separately; `roles` is checked
+        # with the role specs.
+        if not field.init or field.name in ("type", "roles"):
+            continue
+        required = (
+            field.default is MISSING
+            and field.default_factory is MISSING  # type: ignore
+        )
+        type_ = hints[field.name]
+        specs.append((field.name, required, _json_types(type_), _enum_values(type_)))
+    return tuple(specs)
+
+
+@lru_cache(maxsize=None)
+def _compiled() -> Tuple[Dict[str, Tuple], Dict[str, Tuple]]:
+    # Imported here: `claim` validates payloads with this module.
+    from .claim import ServiceClaim, UserClaim
+
+    claims = {
+        "user_claim": _compile(UserClaim),
+        "service_claim": _compile(ServiceClaim),
+    }
+    roles = {
+        "organization_role": _compile(OrganizationRole),
+        "dataset_role": _compile(DatasetRole),
+        "workspace_role": _compile(WorkspaceRole),
+    }
+    return claims, roles
+
+
+def _field_error(specs, data: dict) -> Optional[str]:
+    for name, required, allowed, values in specs:
+        value = data.get(name, _MISSING)
+        if value is _MISSING:
+            if required:
+                return "missing {}".format(name)
+        elif allowed is not None and type(value) not in allowed:
+            return "{} has type {}".format(name, type(value).__name__)
+        elif values is not None and value not in values:
+            return "invalid {} {!r}".format(name, value)
+    return None
+
+
+class ClaimSchema:
+    """
+    Limits and structural checks for the tokens accepted by
+    ``Claim.from_token``. ``max_token_size`` is in characters of the encoded
+    token; ``max_roles`` applies to both payload formats.
+    """
+
+    def __init__(self, max_roles: int = 10000, max_token_size: int = 2 * 1024 * 1024):
+        self.max_roles = max_roles
+        self.max_token_size = max_token_size
+
+    def __repr__(self) -> str:
+        return "ClaimSchema(max_roles={}, max_token_size={})".format(
+            self.max_roles, self.max_token_size
+        )
+
+    def check_token(self, token) -> None:
+        if len(token) > self.max_token_size:
+            raise InvalidClaimError(
+                "Token is larger than {} characters".format(self.max_token_size)
+            )
+
+    def validate(self, data: dict) -> dict:
+        """
+        Check a parsed payload, and return it in the regular format (compact
+        payloads are expanded).
+        """
+        if is_compact(data):
+            self._check_roles(data.get("r"))
+            try:
+                data = expand_payload(data)
+            except (KeyError, TypeError, AttributeError) as e:
+                raise InvalidClaimError("Invalid compact payload") from e
+            except ValueError as e:
+                # Unsupported format version
+                raise InvalidClaimError(str(e)) from e
+
+        claims, roles = _compiled()
+        type_ = data.get("type")
+        specs = claims.get(type_) if type(type_) is str else None
+        if specs is None:
+            raise InvalidClaimError("Invalid claim type {!r}".format(type_))
+        error = _field_error(specs, data)
+        if error is not None:
+            raise InvalidClaimError("claim: " + error)
+
+        payload_roles = data.get("roles")
+        self._check_roles(payload_roles)
+        for position, role in enumerate(payload_roles):  # type: ignore
+            if type(role) is not dict:
+                raise InvalidClaimError("roles[{}]: not an object".format(position))
+            type_ = role.get("type")
+            role_specs = roles.get(type_) if type(type_) is str else None
+            if role_specs is None:
+                raise InvalidClaimError(
+                    "roles[{}]: invalid type {!r}".format(position, type_)
+                )
+            error = _field_error(role_specs, role)
+            if error is not None:
+                raise InvalidClaimError("roles[{}]: {}".format(position, error))
+        return data
+
+    def _check_roles(self, roles) -> None:
+        if type(roles) is not list:
+            raise InvalidClaimError("Claims need a list of roles")
+        if len(roles) > self.max_roles:
+            raise InvalidClaimError(
+                "Claim has more than {} roles".format(self.max_roles)
+            )
+
+
+_schema: Optional[ClaimSchema] = ClaimSchema()
+
+
+def set_claim_schema(schema: Optional[ClaimSchema]) -> None:
+    """
+    Replace the schema used by ``Claim.from_token``, or disable the checks with
+    ``None``.
+    """
+    global _schema
+    _schema = schema
+
+
+def get_claim_schema() -> Optional[ClaimSchema]:
+    return _schema
@@ -1,25 +1,107 @@
 # -*- coding: utf-8 -*-
+import datetime
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
-from . import JwtConfig
+from .config import JwtConfig
 from .claim import Claim, ServiceClaim
 from auth_middleware.role import OrganizationId, OrganizationRole
 from auth_middleware.models import RoleType
 
 
-def create_service_jwt_token(
-    config: JwtConfig, organization_id: OrganizationId, expiry_in_minutes: int = 5
-):
+def _service_claim(organization_id: OrganizationId, expiry_in_minutes: int) -> Claim:
     data = ServiceClaim(
         roles=[OrganizationRole(id=organization_id, role=RoleType.OWNER)]
     )
-    claim = Claim.from_claim_type(data, expiry_in_minutes * 60)
+    return Claim.from_claim_type(data, expiry_in_minutes * 60)
+
+
+def create_service_jwt_token(
+    config: JwtConfig, organization_id: OrganizationId, expiry_in_minutes: int = 5
+):
+    claim = _service_claim(organization_id, expiry_in_minutes)
 
     return claim.encode(config)
 
 
+class ServiceTokenProvider:
+    """
+    Hands out signed service tokens, reusing each one until
+    ``refresh_margin_seconds`` before it expires.
+
+    Tokens are kept per (config, organization, expiry), and a new token is
+    signed ahead of the old one's ``exp``, reusing the serialized claim. The
+    provider can be shared between threads.
+    """
+
+    def __init__(self, refresh_margin_seconds: int = 60):
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._tokens: Dict[Tuple, Tuple[str, float, Claim]] = {}
+        self._lock = threading.Lock()
+
+    def get_token(
+        self,
+        config: JwtConfig,
+        organization_id: OrganizationId,
+        expiry_in_minutes: int = 5,
+    ) -> str:
+        lifetime = expiry_in_minutes * 60
+        if self.refresh_margin_seconds >= lifetime:
+            raise ValueError(
+                "Tokens expiring in {} minutes cannot be refreshed {} seconds "
+                "ahead of time".format(expiry_in_minutes, self.refresh_margin_seconds)
+            )
+
+        key = (config, organization_id.id, organization_id.wildcard, lifetime)
+        entry = self._tokens.get(key)
+        if entry is not None and time.time() < entry[1]:
+            return entry[0]
+
+        with self._lock:
+            # Another thread may have refreshed the token while we waited.
+            now = time.time()
+            entry = self._tokens.get(key)
+            if entry is not None and now < entry[1]:
+                return entry[0]
+            if entry is None:
+                claim = _service_claim(organization_id, expiry_in_minutes)
+            else:
+                claim = entry[2]
+                claim.exp = datetime.datetime.utcnow() + datetime.timedelta(
+                    seconds=lifetime
+                )
+            token = claim.encode(config, cache_content=True)
+            self._tokens[key] = (
+                token,
+                now + lifetime - self.refresh_margin_seconds,
+                claim,
+            )
+            return token
+
+    def get_header(
+        self,
+        config: JwtConfig,
+        organization_id: OrganizationId,
+        expiry_in_minutes: int = 5,
+    ) -> Dict[str, str]:
+        token = self.get_token(config, organization_id, expiry_in_minutes)
+        return {"Authorization": "Bearer {}".format(token)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+
 def create_service_jwt_header(
-    config: JwtConfig, organization_id: OrganizationId, expiry_in_minutes: int = 5
+    config: JwtConfig,
+    organization_id: OrganizationId,
+    expiry_in_minutes: int = 5,
+    provider: Optional[ServiceTokenProvider] = None,
 ):
-    jwt_token = create_service_jwt_token(config, organization_id)
+    if provider is not None:
+        return provider.get_header(config, organization_id, expiry_in_minutes)
+
+    jwt_token = create_service_jwt_token(config, organization_id, expiry_in_minutes)
 
     return {"Authorization": "Bearer {}".format(jwt_token)}
@@ -1,3 +1,7 @@
+from dataclasses import fields
+from typing import Optional
+
+
 def clean_dict(data):
     """
     Delete keys with the value ``None`` in a dictionary, recursively.
@@ -15,3 +19,89 @@ def clean_dict(data):
                 for v in value
             ]
     return data
+
+
+def _frozen_getstate(self):
+    return [getattr(self, field.name) for field in fields(self)]
+
+
+def _frozen_setstate(self, state):
+    for field, value in zip(fields(self), state):
+        object.__setattr__(self, field.name, value)
+
+
+def with_slots(cls):
+    """
+    Recreate the dataclass ``cls`` with ``__slots__`` for its fields, so that
+    instances carry no per-instance ``__dict__``.
+
+    This is what ``dataclass(slots=True)`` does from Python 3.10 on. Apply it
+    directly on top of ``@dataclass``. Slots already declared by a base class
+    are not repeated, and frozen classes get ``__getstate__`` and
+    ``__setstate__`` so that they can still be copied and pickled.
+    """
+    cls_dict = dict(cls.__dict__)
+    inherited = set()
+    for base in cls.__mro__[1:]:
+        inherited.update(base.__dict__.get("__slots__", ()))
+
+    field_names = [field.name for field in fields(cls)]
+    cls_dict["__slots__"] = tuple(
+        name for name in field_names if name not in inherited
+    )
+    # Field defaults live in the generated __init__, the class attributes
+    # would otherwise shadow the slot descriptors.
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    if cls.__dataclass_params__.frozen:  # type: ignore
+        cls_dict.setdefault("__getstate__", _frozen_getstate)
+        cls_dict.setdefault("__setstate__", _frozen_setstate)
+
+    slotted = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+
+class _LazyJsonMethod:
+    """
+    Placeholder for a ``dataclass_json`` method: applies ``dataclass_json`` to
+    the class on first access, which replaces the placeholders.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        from dataclasses_json import dataclass_json
+
+        dataclass_json(owner)
+        return getattr(owner if instance is None else instance, self.name)
+
+
+def lazy_dataclass_json(cls):
+    """
+    ``dataclass_json``, applied the first time one of its methods
+    (``to_json``, ``from_json``, ``to_dict``, ``from_dict``, ``schema``) is
+    used, so that importing a class doesn't import ``dataclasses_json`` and
+    marshmallow. Decoding and encoding tokens don't use these methods.
+    """
+    for name in ("to_json", "from_json", "to_dict", "from_dict", "schema"):
+        setattr(cls, name, _LazyJsonMethod(name))
+    return cls
+
+
+def parse_bearer_token(authorization) -> Optional[str]:
+    """
+    Extract the token from an ``Authorization: Bearer <token>`` header value.
+    Returns ``None`` if the header is missing or uses another scheme.
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Token verification with PyJWT.
+
+``decode`` is ``jwt.decode`` with its default options, parsing the payload
+with ``parse_payload`` whatever the installed PyJWT version. The other
+functions are its steps, as separate functions so that each phase of
+verifying a token can be measured (see ``instrumentation``). The registered
+claims (``exp``, ``iat``, ``nbf``, ``aud``...) are checked by the installed
+PyJWT itself, so that tokens are accepted and rejected as with
+``jwt.decode``.
+"""
+from typing import Union
+
+import jwt
+
+from . import json_backend
+from .config import JwtConfig, JwtKeyRing
+
+
+def verification_config(token, config: Union[JwtConfig, JwtKeyRing]) -> JwtConfig:
+    """
+    The config holding the key for ``token``: ``config`` itself, or the key
+    selected by the token's ``kid`` header.
+    """
+    if isinstance(config, JwtConfig):
+        return config
+    return config.verification_config(jwt.get_unverified_header(token).get("kid"))
+
+
+def verify_signature(token, config: JwtConfig) -> bytes:
+    """
+    Check the signature of ``token`` and return its (still encoded) payload.
+    """
+    decoded = jwt.api_jws.decode_complete(
+        token, key=config.verification_key, algorithms=[config.algorithm]
+    )
+    return decoded["payload"]
+
+
+def parse_payload(payload: bytes) -> dict:
+    """
+    Parse the payload with the fastest installed JSON library (see
+    ``json_backend``).
+    """
+    try:
+        data = json_backend._backend.loads(payload)
+    except ValueError as e:
+        raise jwt.DecodeError("Invalid payload string: %s" % e)
+    if not isinstance(data, dict):
+        raise jwt.DecodeError("Invalid payload string: must be a json object")
+    return data
+
+
+_jwt = jwt.PyJWT()
+
+
+def validate_registered_claims(data: dict) -> None:
+    """
+    Check the registered claims of a payload verified with
+    ``verify_signature``, with the checks and default options of
+    ``jwt.decode``.
+    """
+    _jwt._validate_claims(data, _jwt.options)
+
+
+def decode(token, config: JwtConfig) -> dict:
+    """
+    Verify ``token`` and return its payload, as ``jwt.decode`` does.
+    """
+    data = parse_payload(verify_signature(token, config))
+    validate_registered_claims(data)
+    return data
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+WSGI middleware that verifies bearer tokens before requests reach the app.
+
+    app.wsgi_app = JwtAuthMiddleware(app.wsgi_app, JwtConfig("secret-key"))
+
+The verified ``Claim`` is stored in the WSGI environ under
+``"auth_middleware.claim"`` (``flask.request.environ`` in Flask).
+"""
+import dataclasses
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Collection, Optional
+
+from .cache import CacheStats, ClaimCache
+from .claim import TOKEN_ERRORS, Claim, CognitoSession, ServiceClaim, UserClaim
+from .config import JwtConfig
+from .encoder import encoder_for
+from .models import DatasetPermission, ModelType, RoleType
+from .role import DatasetId, DatasetRole, OrganizationRole, WorkspaceRole
+from .utils import parse_bearer_token
+
+ENVIRON_KEY = "auth_middleware.claim"
+
+
+def _model_types(cls=ModelType):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _model_types(subclass)
+
+
+def warm_up() -> None:
+    """
+    Build the lookup tables and code paths used to verify a token: enum
+    lookups, claim encoders, and one full encode/verify round trip.
+
+    This runs when the module is imported, so that with a preloading server
+    (e.g. ``gunicorn --preload``) workers are forked with everything in place
+    and the first request of each worker is not slower than the rest.
+    """
+    for model in _model_types():
+        model.members()
+        model.values()
+        model.value_set()
+    for cls in (
+        UserClaim,
+        ServiceClaim,
+        CognitoSession,
+        OrganizationRole,
+        DatasetRole,
+        WorkspaceRole,
+    ):
+        encoder_for(cls)
+
+    # Long enough for PyJWT not to warn about an insecure HMAC key
+    config = JwtConfig("auth-middleware-wsgi-warm-up-signing-key")
+    content = UserClaim(id=0, roles=[DatasetRole(id=DatasetId(1), role=RoleType.OWNER)])
+    claim = Claim(content, datetime.datetime.utcnow() + datetime.timedelta(minutes=1))
+    Claim.from_token(claim.encode(config), config).has_dataset_access(
+        DatasetId(1), DatasetPermission.VIEW_FILES
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class VerifyStats:
+    pid: int
+    requests: int
+    rejected: int
+    verify_seconds: float
+    cache: CacheStats
+
+
+class JwtAuthMiddleware:
+    """
+    Rejects requests without a valid bearer token with a ``401`` response and
+    stores the decoded ``Claim`` in the environ of the others.
+
+    Verified claims are cached in a ``ClaimCache`` of ``cache_size`` entries.
+    The cache and the counters returned by ``stats`` belong to the current
+    process: a worker forked from a process that already handled requests
+    starts with an empty cache and zeroed counters.
+
+    If ``status_path`` is set, requests to that path get the ``stats`` of the
+    worker as JSON instead of being passed to the app. Paths in
+    ``exempt_paths`` are passed through without a token.
+    """
+
+    def __init__(
+        self,
+        app,
+        config: JwtConfig,
+        cache_size: int = 1024,
+        exempt_paths: Collection[str] = (),
+        status_path: Optional[str] = None,
+    ):
+        self.app = app
+        self.config = config
+        self.cache_size = cache_size
+        self.exempt_paths = frozenset(exempt_paths)
+        self.status_path = status_path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._cache = ClaimCache(self.cache_size)
+        self._requests = 0
+        self._rejected = 0
+        self._verify_seconds = 0.0
+
+    @property
+    def cache(self) -> ClaimCache:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        return self._cache
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if self.status_path is not None and path == self.status_path:
+            return self._status(start_response)
+        if path in self.exempt_paths:
+            return self.app(environ, start_response)
+
+        token = parse_bearer_token(environ.get("HTTP_AUTHORIZATION"))
+        claim = None if token is None else self._verify(token)
+        if claim is None:
+            detail = "Missing bearer token" if token is None else "Invalid bearer token"
+            return _reject(start_response, detail)
+
+        environ[ENVIRON_KEY] = claim
+        return self.app(environ, start_response)
+
+    def _verify(self, token: str) -> Optional[Claim]:
+        cache = self.cache
+        start = time.perf_counter()
+        try:
+            claim: Optional[Claim] = Claim.from_token(token, self.config, cache=cache)
+        except TOKEN_ERRORS:
+            claim = None
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._requests += 1
+            self._verify_seconds += elapsed
+            if claim is None:
+                self._rejected += 1
+        return claim
+
+    def stats(self) -> VerifyStats:
+        cache = self.cache
+        with self._lock:
+            return VerifyStats(
+                pid=self._pid,
+                requests=self._requests,
+                rejected=self._rejected,
+                verify_seconds=self._verify_seconds,
+                cache=cache.stats(),
+            )
+
+    def _status(self, start_response):
+        body = json.dumps(dataclasses.asdict(self.stats())).encode("utf-8")
+        start_response(
+            "200 OK",
+            [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(body))),
+            ],
+        )
+        return [body]
+
+
+def _reject(start_response, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    start_response(
+        "401 Unauthorized",
+        [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("WWW-Authenticate", "Bearer"),
+        ],
+    )
+    return [body]
+
+
+def claim_from_environ(environ) -> Optional[Claim]:
+    return environ.get(ENVIRON_KEY)
+
+
+warm_up()
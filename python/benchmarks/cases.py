@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from functools import partial
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from auth_middleware import (
+    Claim,
+    JwtConfig,
+    ServiceClaim,
+    UserClaim,
+    claim_from_dict,
+    create_service_jwt_header,
+)
+from auth_middleware.encoder import encoder_for
+from auth_middleware.json_backend import BACKENDS, load_backend
+from auth_middleware.models import DatasetPermission, FeatureFlag, RoleType
+from auth_middleware.role import (
+    DatasetId,
+    DatasetRole,
+    OrganizationId,
+    OrganizationRole,
+    role_from_dict,
+)
+
+ROLE_COUNTS = (1, 10, 100, 1000)
+
+config = JwtConfig("benchmark-secret-key")
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def resources_dir() -> str:
+    for path in (
+        os.path.join(os.path.dirname(__file__), "..", "..", "resources"),
+        os.path.join(os.getcwd(), "resources"),
+    ):
+        if os.path.isdir(path):
+            return os.path.abspath(path)
+    raise FileNotFoundError("Could not find the resources/ directory")
+
+
+def load_fixtures() -> Dict[str, dict]:
+    fixtures = {}
+    directory = resources_dir()
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name)) as f:
+            data = json.load(f)
+        # Only full claims, not the bare cognito session fixtures
+        if "roles" in data:
+            fixtures[name[: -len(".json")]] = data
+    return fixtures
+
+
+def synthetic_claim(role_count: int) -> UserClaim:
+    """
+    A user claim with one organization role followed by dataset roles, for a
+    total of ``role_count`` roles.
+    """
+    roles: List = [
+        OrganizationRole(
+            id=OrganizationId(1),
+            role=RoleType.OWNER,
+            node_id="N:organization:38e9544e-3f23-4057-a76a-3e2a4f767e61",
+            enabled_features=list(FeatureFlag.members()),
+            encryption_key_id="arn:aws:iam::111122223333:role/KMSAdminRole",
+        )
+    ]
+    roles.extend(
+        DatasetRole(
+            id=DatasetId(i),
+            role=RoleType.EDITOR,
+            node_id="N:dataset:{:08d}-3f23-4057-a76a-3e2a4f767e61".format(i),
+        )
+        for i in range(1, role_count)
+    )
+    return UserClaim(id=12345, roles=roles, node_id="N:user:12345")
+
+
+def payload(content) -> dict:
+    return json.loads(content.to_json())
+
+
+def _claim_cases(label: str, content) -> Iterator[Case]:
+    claim = Claim.from_claim_type(content, 3600)
+    token = claim.encode(config)
+    compact_token = claim.encode(config, compact=True)
+    data = payload(content)
+    roles = data["roles"]
+    last_dataset = DatasetId(max(len(roles) - 1, 1))
+
+    yield "encode/{}".format(label), lambda: claim.encode(config)
+    yield "encode_cached_content/{}".format(label), lambda: claim.encode(
+        config, cache_content=True
+    )
+    yield "encode_compact/{}".format(label), lambda: claim.encode(config, compact=True)
+    yield "from_token/{}".format(label), lambda: Claim.from_token(token, config)
+    yield "from_token_compact/{}".format(label), lambda: Claim.from_token(
+        compact_token, config
+    )
+    yield "from_token_lazy/{}".format(label), lambda: Claim.from_token(
+        token, config, lazy=True
+    ).head_organization_id
+    yield "claim_from_dict/{}".format(label), lambda: claim_from_dict(data)
+    yield "role_from_dict/{}".format(label), lambda: role_from_dict(roles)
+    yield "get_role/{}".format(label), lambda: claim.get_role(last_dataset)
+    yield "has_dataset_access/{}".format(label), lambda: claim.has_dataset_access(
+        last_dataset, DatasetPermission.EDIT_FILES
+    )
+    cached = Claim.from_claim_type(content, 3600)
+    cached.cache_decisions()
+    yield "has_dataset_access_cached/{}".format(
+        label
+    ), lambda: cached.has_dataset_access(last_dataset, DatasetPermission.EDIT_FILES)
+
+    # A page of search results, checked one by one or in bulk
+    page = list(range(1, 501))
+    yield "has_dataset_access_page/{}".format(label), lambda: [
+        claim.has_dataset_access(DatasetId(id_), DatasetPermission.EDIT_FILES)
+        for id_ in page
+    ]
+    yield "has_dataset_access_many/{}".format(
+        label
+    ), lambda: claim.has_dataset_access_many(page, DatasetPermission.EDIT_FILES)
+
+
+def _json_cases(label: str, content) -> Iterator[Case]:
+    # The payload parsed by `from_token` and the content serialized by
+    # `encode`, with each installed JSON library
+    data = encoder_for(type(content))(content)
+    document = json.dumps(dict(data, exp=2**31, iat=0)).encode("utf-8")
+    for name in BACKENDS:
+        try:
+            backend = load_backend(name)
+        except ImportError:
+            continue
+        yield "json_loads/{}/{}".format(name, label), partial(backend.loads, document)
+        yield "json_dumps/{}/{}".format(name, label), partial(backend.dumps, data)
+
+
+def asymmetric_configs() -> Dict[str, Tuple[JwtConfig, str]]:
+    """
+    A signing config for each asymmetric algorithm and the PEM encoded public
+    key that verifies its tokens. Empty if ``cryptography`` is not installed.
+    """
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+    except ImportError:
+        return {}
+
+    keys = {
+        "RS256": rsa.generate_private_key(public_exponent=65537, key_size=2048),
+        "ES256": ec.generate_private_key(ec.SECP256R1()),
+        "EdDSA": ed25519.Ed25519PrivateKey.generate(),
+    }
+    return {
+        algorithm: (
+            JwtConfig(key, algorithm=algorithm),
+            key.public_key()
+            .public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode("utf-8"),
+        )
+        for algorithm, key in keys.items()
+    }
+
+
+def _algorithm_cases(role_count: int) -> Iterator[Case]:
+    claim = Claim.from_claim_type(synthetic_claim(role_count), 3600)
+    configs = {"HS256": (config, config.key)}
+    configs.update(asymmetric_configs())
+
+    for algorithm, (signing, public_pem) in configs.items():
+        label = "{}/roles={}".format(algorithm, role_count)
+        verifying = JwtConfig(public_pem, algorithm=algorithm)
+        token = claim.encode(signing)
+
+        yield "encode/{}".format(label), lambda: claim.encode(signing)
+        yield "from_token/{}".format(label), lambda: Claim.from_token(token, verifying)
+        # A new config loads the key again on every call, as PyJWT did with
+        # the PEM string before keys were prepared once per config.
+        yield "from_token_unprepared_key/{}".format(label), lambda: Claim.from_token(
+            token, JwtConfig(public_pem, algorithm=algorithm)
+        )
+
+
+def _labelled_claims() -> Iterator[Tuple[str, object]]:
+    for count in ROLE_COUNTS:
+        yield "roles={}".format(count), synthetic_claim(count)
+    for name, data in load_fixtures().items():
+        yield "fixture={}".format(name), claim_from_dict(data)
+
+
+def token_sizes() -> Iterator[dict]:
+    """
+    Size of the tokens of each benchmarked claim, in the regular and the
+    compact format.
+    """
+    for label, content in _labelled_claims():
+        claim = Claim.from_claim_type(content, 3600)
+        yield {
+            "name": "token_size/{}".format(label),
+            "bytes": len(claim.encode(config)),
+            "compact_bytes": len(claim.encode(config, compact=True)),
+        }
+
+
+def cases() -> Iterator[Case]:
+    for label, content in _labelled_claims():
+        yield from _claim_cases(label, content)
+        yield from _json_cases(label, content)
+
+    for count in (1, 100):
+        yield from _algorithm_cases(count)
+
+    yield "dataset_id/small", lambda: DatasetId(12)
+    yield "dataset_id/large", lambda: DatasetId(1234567)
+    yield "dataset_id/string", lambda: DatasetId("12")
+    yield "dataset_id/from_int", lambda: DatasetId.from_int(12)
+    yield "create_service_jwt_header", lambda: create_service_jwt_header(
+        config, OrganizationId(1)
+    )
+    yield "encode/service_claim", lambda: Claim.from_claim_type(
+        ServiceClaim(
+            roles=[OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER)]
+        ),
+        300,
+    ).encode(config)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for the auth_middleware hot paths.
+
+Run from the ``python/`` directory::
+
+    python -m benchmarks.run
+    python -m benchmarks.run --save-baseline baseline.json
+    python -m benchmarks.run --baseline baseline.json --max-ratio 1.5
+    python -m benchmarks.run --sizes
+
+Each result is printed as one JSON object per line. When a baseline is given
+the run fails if any benchmark is slower than ``max-ratio`` times its baseline.
+``--sizes`` prints the token sizes of the benchmarked claims instead.
+"""
+import argparse
+import json
+import sys
+import timeit
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from .cases import Case, cases, token_sizes
+
+
+def measure(
+    func: Callable[[], object], repeat: int, min_time: float
+) -> Tuple[float, int]:
+    """
+    Return the best time per call, in seconds, and the number of calls per
+    timing run, which is chosen so that a run takes at least ``min_time``.
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number, number
+
+
+def run(selected: Iterable[Case], repeat: int, min_time: float) -> List[dict]:
+    results = []
+    for name, func in selected:
+        seconds, number = measure(func, repeat, min_time)
+        result = {
+            "name": name,
+            "seconds_per_call": seconds,
+            "number": number,
+            "repeat": repeat,
+        }
+        print(json.dumps(result), flush=True)
+        results.append(result)
+    return results
+
+
+def compare(
+    results: List[dict], baseline: Dict[str, float], max_ratio: float
+) -> List[dict]:
+    """
+    Return the results that exceed their baseline by more than ``max_ratio``.
+    Benchmarks that are missing from the baseline are ignored.
+    """
+    regressions = []
+    for result in results:
+        expected = baseline.get(result["name"])
+        if expected is None:
+            continue
+        ratio = result["seconds_per_call"] / expected
+        if ratio > max_ratio:
+            regressions.append(dict(result, baseline=expected, ratio=ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "-k", "--filter", default="", help="run benchmarks whose name contains this"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="seconds per timing run"
+    )
+    parser.add_argument(
+        "--baseline", help="JSON file mapping benchmark names to seconds per call"
+    )
+    parser.add_argument("--max-ratio", type=float, default=1.5)
+    parser.add_argument(
+        "--save-baseline", help="write the results to this file as a baseline"
+    )
+    parser.add_argument(
+        "--sizes", action="store_true", help="print token sizes, in both formats"
+    )
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        for size in token_sizes():
+            if args.filter in size["name"]:
+                print(json.dumps(size))
+        return 0
+
+    selected = (case for case in cases() if args.filter in case[0])
+    results = run(selected, args.repeat, args.min_time)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(
+                {r["name"]: r["seconds_per_call"] for r in results},
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_ratio)
+        for regression in regressions:
+            print(json.dumps(dict(regression, regression=True)), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,7 +16,7 @@ setup(
     author="University of Pennsylvania",
     author_email="peter@pennsieve.com",
     description="Tool for generating JWT tokens for Pennsieve Platform (internal only)",
-    packages=find_packages(),
+    packages=find_packages(exclude=("test", "test.*", "benchmarks", "benchmarks.*")),
     package_dir={"auth_middleware": "auth_middleware"},
     install_requires=requirements,
     license="",
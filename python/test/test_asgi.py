@@ -0,0 +1,143 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from auth_middleware import Claim, ClaimCache
+from auth_middleware.asgi import JwtAuthMiddleware
+from auth_middleware.config import JwtConfig
+from auth_middleware.models import DatasetPermission, RoleType
+from auth_middleware.role import DatasetId
+from auth_middleware.utils import parse_bearer_token
+from test.utils import config, make_token
+
+
+class App:
+    def __init__(self):
+        self.scopes = []
+
+    async def __call__(self, scope, receive, send):
+        self.scopes.append(scope)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+def call(middleware, authorization=None, type_="http", path="/"):
+    headers = []
+    if authorization is not None:
+        headers.append((b"authorization", authorization.encode("latin-1")))
+    scope = {"type": type_, "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return scope, messages
+
+
+def bearer(token):
+    return "Bearer {}".format(token)
+
+
+def test_parse_bearer_token():
+    assert parse_bearer_token("Bearer abc") == "abc"
+    assert parse_bearer_token("bearer  abc ") == "abc"
+    assert parse_bearer_token("Basic abc") is None
+    assert parse_bearer_token("Bearer") is None
+    assert parse_bearer_token(None) is None
+
+
+def test_valid_token_attaches_claim():
+    app = App()
+    scope, messages = call(JwtAuthMiddleware(app, config), bearer(make_token(1)))
+    assert app.scopes == [scope]
+    assert messages[0]["status"] == 200
+    assert scope["claim"].head_dataset_id == DatasetId(1)
+    assert scope["state"]["claim"] is scope["claim"]
+
+
+@pytest.mark.parametrize(
+    "authorization",
+    [
+        None,
+        "Basic dXNlcjpwYXNz",
+        bearer("not-a-token"),
+        bearer(make_token(1, seconds=-10)),
+        bearer(make_token(1, token_config=JwtConfig("other-key"))),
+    ],
+)
+def test_rejects_before_app(authorization):
+    app = App()
+    scope, messages = call(JwtAuthMiddleware(app, config), authorization)
+    assert app.scopes == []
+    assert "claim" not in scope
+    start, body = messages
+    assert start["status"] == 401
+    assert (b"www-authenticate", b"Bearer") in start["headers"]
+    assert "detail" in json.loads(body["body"])
+
+
+def test_rejects_websocket():
+    app = App()
+    _, messages = call(JwtAuthMiddleware(app, config), type_="websocket")
+    assert app.scopes == []
+    assert messages == [{"type": "websocket.close", "code": 1008}]
+
+
+def test_exempt_paths_and_lifespan():
+    app = App()
+    middleware = JwtAuthMiddleware(app, config, exempt_paths=["/health"])
+    call(middleware, path="/health")
+    call(middleware, type_="lifespan")
+    assert len(app.scopes) == 2
+
+
+def test_large_tokens_are_offloaded():
+    token = make_token(0, roles=50, role=RoleType.VIEWER)
+    app = App()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        middleware = JwtAuthMiddleware(
+            app, config, offload_threshold=100, executor=executor
+        )
+        scope, _ = call(middleware, bearer(token))
+    assert scope["claim"].has_dataset_access(
+        DatasetId(49), DatasetPermission.VIEW_FILES
+    )
+
+
+def test_cache_is_used():
+    cache = ClaimCache()
+    middleware = JwtAuthMiddleware(App(), config, cache=cache)
+    token = make_token(1)
+    first, _ = call(middleware, bearer(token))
+    second, _ = call(middleware, bearer(token))
+    assert second["claim"] is first["claim"]
+    assert cache.stats().hits == 1
+
+
+def test_dependencies():
+    pytest.importorskip("starlette")
+    from starlette.exceptions import HTTPException
+    from starlette.requests import HTTPConnection
+    from auth_middleware.asgi import get_claim, require_dataset_access
+
+    claim = Claim.from_token(make_token(1), config)
+
+    def connection(dataset_id, with_claim=True):
+        scope = {"type": "http", "path_params": {"dataset_id": dataset_id}}
+        if with_claim:
+            scope["claim"] = claim
+        return HTTPConnection(scope)
+
+    dependency = require_dataset_access(DatasetPermission.VIEW_FILES)
+    assert dependency(connection("1")) is claim
+    with pytest.raises(HTTPException) as e:
+        dependency(connection("2"))
+    assert e.value.status_code == 403
+    with pytest.raises(HTTPException) as e:
+        get_claim(connection("1", with_claim=False))
+    assert e.value.status_code == 401
@@ -0,0 +1,96 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from auth_middleware import Claim, ClaimCache, JwtConfig
+from auth_middleware.models import DatasetPermission
+from auth_middleware.role import DatasetId
+from test.utils import make_claim
+
+serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa  # noqa: E402
+
+
+def generate(algorithm):
+    if algorithm == "RS256":
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    return ed25519.Ed25519PrivateKey.generate()
+
+
+def pem(private_key):
+    private = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private.decode("utf-8"), public.decode("utf-8")
+
+
+ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+KEYS = {algorithm: generate(algorithm) for algorithm in ALGORITHMS}
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_sign_with_private_pem_verify_with_public_pem(algorithm):
+    private, public = pem(KEYS[algorithm])
+    token = make_claim().encode(JwtConfig(private, algorithm=algorithm))
+    assert jwt.get_unverified_header(token)["alg"] == algorithm
+
+    claim = Claim.from_token(token, JwtConfig(public, algorithm=algorithm))
+    assert claim.has_dataset_access(DatasetId(1), DatasetPermission.VIEW_FILES)
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_key_objects(algorithm):
+    private_key = KEYS[algorithm]
+    signing = JwtConfig(private_key, algorithm=algorithm)
+    verifying = JwtConfig(private_key.public_key(), algorithm=algorithm)
+    token = make_claim().encode(signing)
+    assert Claim.from_token(token, verifying).head_dataset_id == DatasetId(1)
+    # A private key verifies the tokens it signs
+    assert Claim.from_token(token, signing).head_dataset_id == DatasetId(1)
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_wrong_public_key_is_rejected(algorithm):
+    token = make_claim().encode(JwtConfig(KEYS[algorithm], algorithm=algorithm))
+    other = JwtConfig(generate(algorithm).public_key(), algorithm=algorithm)
+    with pytest.raises(jwt.InvalidSignatureError):
+        Claim.from_token(token, other)
+
+
+def test_public_key_cannot_sign():
+    _, public = pem(KEYS["RS256"])
+    with pytest.raises(ValueError):
+        make_claim().encode(JwtConfig(public, algorithm="RS256"))
+
+
+def test_keys_are_loaded_once():
+    private, _ = pem(KEYS["ES256"])
+    config = JwtConfig(private, algorithm="ES256")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        keys = list(executor.map(lambda _: config.verification_key, range(32)))
+    assert all(key is keys[0] for key in keys)
+    assert config.signing_key is config.signing_key
+    assert config.verification_key is not config.signing_key
+
+
+def test_config_with_key_object_is_hashable_and_picklable():
+    private, _ = pem(KEYS["RS256"])
+    config = JwtConfig(private, algorithm="RS256")
+    config.signing_key
+    assert pickle.loads(pickle.dumps(config)) == config
+
+    object_config = JwtConfig(KEYS["RS256"].public_key(), algorithm="RS256")
+    assert hash(object_config) == hash(object_config)
+
+    cache = ClaimCache()
+    token = make_claim().encode(JwtConfig(KEYS["RS256"], algorithm="RS256"))
+    first = Claim.from_token(token, object_config, cache=cache)
+    assert Claim.from_token(token, object_config, cache=cache) is first
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from auth_middleware import Claim, ClaimCache
+from auth_middleware.config import JwtConfig
+from auth_middleware.role import DatasetId
+from test.utils import config, make_token
+
+
+def invalid_type_token():
+    payload = {"type": "temporary", "roles": [], "exp": 2**31, "iat": 0}
+    return jwt.encode(payload, config.key, algorithm=config.algorithm)
+
+
+def mixed_batch():
+    first, second = make_token(1), make_token(2)
+    return [
+        first,
+        make_token(3, seconds=-10),
+        second,
+        make_token(4, token_config=JwtConfig("other-key")),
+        first,
+        invalid_type_token(),
+        "not-a-token",
+    ]
+
+
+def check_results(tokens, results):
+    assert len(results) == len(tokens)
+    assert results[0].head_dataset_id == DatasetId(1)
+    assert isinstance(results[1], jwt.exceptions.ExpiredSignatureError)
+    assert results[2].head_dataset_id == DatasetId(2)
+    assert isinstance(results[3], jwt.exceptions.InvalidSignatureError)
+    assert results[4] is results[0]
+    # Rejected for its claim type, not for its timestamps
+    assert isinstance(results[5], ValueError)
+    assert "temporary" in str(results[5])
+    assert isinstance(results[6], jwt.exceptions.DecodeError)
+
+
+def test_from_tokens():
+    tokens = mixed_batch()
+    check_results(tokens, Claim.from_tokens(tokens, config))
+
+
+def test_from_tokens_with_executor():
+    tokens = mixed_batch()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = Claim.from_tokens(tokens, config, executor=executor)
+    check_results(tokens, results)
+
+
+def test_from_tokens_with_cache():
+    cache = ClaimCache()
+    tokens = [make_token(1), make_token(2)]
+    first = Claim.from_tokens(tokens, config, cache=cache)
+    second = Claim.from_tokens(tokens + tokens, config, cache=cache)
+    assert second == first + first
+    assert cache.stats().hits == 2
+
+
+def test_from_tokens_empty():
+    assert Claim.from_tokens([], config) == []
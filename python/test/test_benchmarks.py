@@ -0,0 +1,27 @@
+from benchmarks.cases import token_sizes
+from benchmarks.run import compare, run
+
+
+def test_compare_flags_regressions():
+    results = [
+        {"name": "fast", "seconds_per_call": 1.0},
+        {"name": "slow", "seconds_per_call": 2.0},
+        {"name": "new", "seconds_per_call": 5.0},
+    ]
+    baseline = {"fast": 1.0, "slow": 1.0}
+    regressions = compare(results, baseline, max_ratio=1.5)
+    assert [r["name"] for r in regressions] == ["slow"]
+    assert regressions[0]["ratio"] == 2.0
+
+
+def test_run_reports_results(capsys):
+    results = run([("noop", lambda: None)], repeat=1, min_time=0.0)
+    assert results[0]["name"] == "noop"
+    assert results[0]["seconds_per_call"] > 0
+    assert '"name": "noop"' in capsys.readouterr().out
+
+
+def test_token_sizes():
+    sizes = {size["name"]: size for size in token_sizes()}
+    size = sizes["token_size/roles=100"]
+    assert size["compact_bytes"] < size["bytes"]
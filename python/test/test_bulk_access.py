@@ -0,0 +1,157 @@
+import datetime
+
+import pytest
+from auth_middleware import Claim, UserClaim
+from auth_middleware.models import DatasetPermission, RoleType
+from auth_middleware.role import (
+    DatasetId,
+    DatasetRole,
+    Id,
+    OrganizationId,
+    OrganizationRole,
+    WorkspaceId,
+    WorkspaceRole,
+)
+
+EXP = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+PERMISSIONS = [
+    DatasetPermission.VIEW_FILES,
+    DatasetPermission.EDIT_FILES,
+    DatasetPermission.DELETE_DATASET,
+    [DatasetPermission.VIEW_FILES, DatasetPermission.EDIT_FILES],
+    [],
+    "view_files",
+]
+
+IDS = [1, 2, 3, 4, "2", "5", "*", "N:dataset:1", DatasetId(2), OrganizationId(1)]
+
+
+def make_claim(*roles):
+    return Claim(
+        UserClaim(
+            id=1,
+            roles=[OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER)]
+            + list(roles),
+        ),
+        EXP,
+    )
+
+
+CLAIMS = [
+    make_claim(),
+    make_claim(
+        DatasetRole(id=DatasetId(1), role=RoleType.VIEWER),
+        DatasetRole(id=DatasetId(2), role=RoleType.EDITOR),
+        DatasetRole(id=DatasetId(2), role=RoleType.OWNER),
+        DatasetRole(id=DatasetId(3), role=RoleType.GUEST),
+    ),
+    make_claim(
+        DatasetRole(id=DatasetId(1), role=RoleType.VIEWER),
+        DatasetRole(id=DatasetId("*"), role=RoleType.EDITOR),
+    ),
+    make_claim(
+        DatasetRole(id=DatasetId("*"), role=RoleType.VIEWER),
+        DatasetRole(id=DatasetId(2), role=RoleType.OWNER),
+    ),
+]
+
+
+def expected(claim, id_type, ids, permissions):
+    results = []
+    for id_ in ids:
+        if isinstance(id_, Id):
+            if type(id_) is not id_type:
+                # Unlike has_dataset_access, ids of other types are denied
+                results.append(False)
+                continue
+            role_id = id_
+        else:
+            role_id = id_type(id_)
+        role = claim.get_role(role_id)
+        if role is None:
+            results.append(False)
+        elif isinstance(permissions, list):
+            results.append(role.has_permissions(permissions))
+        else:
+            results.append(role.has_permission(permissions))
+    return results
+
+
+@pytest.mark.parametrize("claim", CLAIMS)
+@pytest.mark.parametrize("permissions", PERMISSIONS)
+def test_has_dataset_access_many_matches_single_checks(claim, permissions):
+    assert claim.has_dataset_access_many(IDS, permissions) == expected(
+        claim, DatasetId, IDS, permissions
+    )
+
+
+def test_filter_dataset_access():
+    claim = CLAIMS[3]
+    assert claim.filter_dataset_access(iter(IDS), DatasetPermission.VIEW_FILES) == [
+        1,
+        2,
+        3,
+        4,
+        "2",
+        "5",
+        "*",
+        "N:dataset:1",
+        DatasetId(2),
+    ]
+    assert claim.filter_dataset_access(IDS, DatasetPermission.DELETE_DATASET) == [
+        2,
+        "2",
+        DatasetId(2),
+    ]
+
+
+def test_workspace_access_many():
+    claim = make_claim(
+        WorkspaceRole(id=WorkspaceId(7), role=RoleType.EDITOR),
+        DatasetRole(id=DatasetId(8), role=RoleType.OWNER),
+    )
+    ids = [7, 8, WorkspaceId(7), DatasetId(7)]
+    assert claim.has_workspace_access_many(ids, DatasetPermission.EDIT_FILES) == [
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert claim.filter_workspace_access(ids, DatasetPermission.EDIT_FILES) == [
+        7,
+        WorkspaceId(7),
+    ]
+
+
+def test_unknown_permissions_are_denied():
+    claim = CLAIMS[2]
+    assert claim.has_dataset_access_many([1, 2], "unknown") == [False, False]
+    assert claim.has_dataset_access_many([1, 2], ["unknown"]) == [False, False]
+
+
+def test_lazy_claim():
+    data = dict(CLAIMS[3].content.to_dict(encode_json=True), exp=EXP.timestamp(), iat=0)
+    data["roles"] = [
+        {key: value for key, value in role.items() if value is not None}
+        for role in data["roles"]
+    ]
+    lazy = Claim.from_dict(dict(data), lazy=True)
+    eager = Claim.from_dict(dict(data))
+    for permissions in PERMISSIONS:
+        assert lazy.has_dataset_access_many(
+            IDS, permissions
+        ) == eager.has_dataset_access_many(IDS, permissions)
+
+
+@pytest.mark.parametrize("claim", CLAIMS)
+def test_single_checks_accept_raw_ids(claim):
+    raw_ids = [id_ for id_ in IDS if not isinstance(id_, Id)]
+    permission = DatasetPermission.EDIT_FILES
+    assert [
+        claim.has_dataset_access(id_, permission) for id_ in raw_ids
+    ] == claim.has_dataset_access_many(raw_ids, permission)
+    assert claim.has_organization_access(1)
+    assert not claim.has_workspace_access(1, permission)
+    # Without an id type, raw ids match no role
+    assert claim.get_role(1) is None
@@ -0,0 +1,91 @@
+import threading
+
+import jwt
+import pytest
+from auth_middleware import Claim, ClaimCache
+from auth_middleware.config import JwtConfig
+from test.utils import config, make_token
+
+
+def test_cache_hit_returns_decoded_claim():
+    cache = ClaimCache()
+    token = make_token()
+    first = Claim.from_token(token, config, cache=cache)
+    second = Claim.from_token(token, config, cache=cache)
+    assert first is second
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.misses == 1
+    assert stats.size == 1
+
+
+def test_cache_is_keyed_by_config():
+    cache = ClaimCache()
+    other_config = JwtConfig("other-key")
+    token = make_token()
+    Claim.from_token(token, config, cache=cache)
+    with pytest.raises(jwt.exceptions.InvalidSignatureError):
+        Claim.from_token(token, other_config, cache=cache)
+
+
+def test_cache_does_not_store_failures():
+    cache = ClaimCache()
+    token = make_token(token_config=JwtConfig("other-key"))
+    for _ in range(2):
+        with pytest.raises(jwt.exceptions.InvalidSignatureError):
+            Claim.from_token(token, config, cache=cache)
+    assert cache.stats().misses == 2
+    assert len(cache) == 0
+
+
+def test_cache_lru_eviction():
+    cache = ClaimCache(maxsize=2)
+    tokens = [make_token(dataset_id=i) for i in range(3)]
+    for token in tokens:
+        Claim.from_token(token, config, cache=cache)
+    assert len(cache) == 2
+    assert cache.stats().evictions == 1
+
+    Claim.from_token(tokens[0], config, cache=cache)
+    assert cache.stats().misses == 4
+
+
+def test_cache_expired_entry_is_evicted(monkeypatch):
+    cache = ClaimCache()
+    token = make_token(seconds=60)
+    Claim.from_token(token, config, cache=cache)
+
+    import auth_middleware.cache as cache_module
+
+    real_time = cache_module.time.time
+    monkeypatch.setattr(cache_module.time, "time", lambda: real_time() + 120)
+    Claim.from_token(token, config, cache=cache)
+    stats = cache.stats()
+    assert stats.evictions == 1
+    assert stats.misses == 2
+    assert stats.hits == 0
+
+
+def test_cache_threaded_access():
+    cache = ClaimCache(maxsize=8)
+    tokens = [make_token(dataset_id=i) for i in range(16)]
+    errors = []
+
+    def worker():
+        try:
+            for token in tokens * 4:
+                claim = Claim.from_token(token, config, cache=cache)
+                assert claim.is_user_claim
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    stats = cache.stats()
+    assert stats.hits + stats.misses == 16 * 4 * 4
+    assert len(cache) <= 8
@@ -244,3 +244,62 @@ def test_decode_different_key():
     with pytest.raises(jwt.exceptions.InvalidSignatureError):
         decoded_claim = Claim.from_token(token, bad_config)
         assert decoded_claim is not None
+
+
+def linear_get_role(roles, role_id):
+    wildcard_role = None
+    for role in roles:
+        if role.id == role_id:
+            return role
+        if role.id.matches(role_id) and wildcard_role is None:
+            wildcard_role = role
+    return wildcard_role
+
+
+def test_indexed_get_role_matches_linear_scan():
+    roles = [
+        DatasetRole(id=DatasetId(3), role=RoleType.VIEWER),
+        OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER),
+        DatasetRole(id=DatasetId("*"), role=RoleType.EDITOR),
+        DatasetRole(id=DatasetId(3), role=RoleType.OWNER),
+        DatasetRole(id=DatasetId("*"), role=RoleType.MANAGER),
+        WorkspaceRole(id=WorkspaceId(3), role=RoleType.OWNER),
+        OrganizationRole(id=OrganizationId("*"), role=RoleType.VIEWER),
+    ]
+    claim = Claim.from_claim_type(UserClaim(id=1, roles=roles), 10)
+    for id_type in (DatasetId, OrganizationId, WorkspaceId):
+        for value in (1, 2, 3, "*", -1):
+            role_id = id_type(value)
+            assert claim.get_role(role_id) is linear_get_role(roles, role_id)
+
+
+def test_organization_node_id():
+    data = UserClaim(
+        id=12345,
+        roles=[
+            DatasetRole(id=DatasetId(1), role=RoleType.OWNER, node_id="N:dataset:1"),
+            OrganizationRole(
+                id=OrganizationId(1), role=RoleType.OWNER, node_id="N:org:1"
+            ),
+            OrganizationRole(
+                id=OrganizationId(2), role=RoleType.OWNER, node_id="N:org:2"
+            ),
+        ],
+    )
+    claim = Claim.from_claim_type(data, 10)
+    assert claim.organization_node_id(OrganizationId(2)) == "N:org:2"
+    assert claim.organization_node_id(OrganizationId(3)) is None
+
+
+def test_role_index_follows_content():
+    claim = Claim.from_claim_type(
+        UserClaim(id=1, roles=[DatasetRole(id=DatasetId(1), role=RoleType.OWNER)]),
+        10,
+    )
+    assert claim.get_role(DatasetId(2)) is None
+
+    claim.content = UserClaim(
+        id=1, roles=[DatasetRole(id=DatasetId(2), role=RoleType.OWNER)]
+    )
+    assert claim.get_role(DatasetId(2)).role == RoleType.OWNER
+    assert claim.dataset_ids == [DatasetId(2)]
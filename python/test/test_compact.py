@@ -0,0 +1,142 @@
+import json
+
+import jwt
+import pytest
+from auth_middleware import Claim, ServiceClaim, UserClaim, claim_from_dict
+from auth_middleware.compact import compact_payload, expand_payload
+from auth_middleware.encoder import encoder_for
+from auth_middleware.models import FeatureFlag, RoleType
+from auth_middleware.role import (
+    DatasetId,
+    DatasetRole,
+    OrganizationId,
+    OrganizationRole,
+    WorkspaceId,
+    WorkspaceRole,
+)
+from test.utils import config, load_claim
+
+FIXTURES = [
+    "claim_complex_roles.json",
+    "claim_locked_datasets.json",
+    "claim_no_session.json",
+    "claim_secret_key_id.json",
+    "claim_simple_service.json",
+    "claim_simple_user.json",
+    "claim_simple_user_with_node_id.json",
+    "claim_with_explicit_session.json",
+    "claim_with_unsupported_features.json",
+]
+
+
+def large_claim():
+    return UserClaim(
+        id=12345,
+        node_id="N:user:38e9544e-3f23-4057-a76a-3e2a4f767e61",
+        roles=[
+            OrganizationRole(
+                id=OrganizationId(1),
+                role=RoleType.OWNER,
+                encryption_key_id="arn:aws:iam::111122223333:role/KMSAdminRole",
+                node_id="N:organization:38e9544e-3f23-4057-a76a-3e2a4f767e61",
+                enabled_features=list(FeatureFlag.members()),
+            ),
+            DatasetRole(
+                id=DatasetId(2),
+                role=RoleType.EDITOR,
+                node_id="N:dataset:38e9544e-3f23-4057-a76a-3e2a4f767e61",
+                locked=True,
+            ),
+            WorkspaceRole(id=WorkspaceId(3), role=RoleType.GUEST),
+        ],
+    )
+
+
+def payload_of(token):
+    return jwt.decode(token, config.key, algorithms=[config.algorithm])
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+@pytest.mark.parametrize("lazy", [False, True])
+def test_fixtures_round_trip(name, lazy):
+    content = claim_from_dict(load_claim(name))
+    token = Claim.from_claim_type(content, 10).encode(config, compact=True)
+    assert payload_of(token)["v"] == 1
+    assert Claim.from_token(token, config, lazy=lazy).content == content
+
+
+def test_same_claim_as_regular_format():
+    claim = Claim.from_claim_type(large_claim(), 10)
+    regular = Claim.from_token(claim.encode(config), config)
+    compact = Claim.from_token(claim.encode(config, compact=True), config)
+    assert compact.content == regular.content
+    assert compact.exp == regular.exp and compact.iat == regular.iat
+
+
+def test_compact_tokens_are_smaller():
+    claim = Claim.from_claim_type(large_claim(), 10)
+    regular = claim.encode(config)
+    compact = claim.encode(config, compact=True)
+    assert len(compact) < len(regular) / 2
+
+
+def test_node_ids():
+    data = encoder_for(UserClaim)(large_claim())
+    compact = compact_payload(data)
+    assert compact["n"] == "38e9544e-3f23-4057-a76a-3e2a4f767e61"
+    assert compact["r"][1]["n"] == "38e9544e-3f23-4057-a76a-3e2a4f767e61"
+    assert expand_payload(compact) == data
+
+    for node_id in ("N:dataset:38e9544e-3f23-4057-a76a-3e2a4f767e61", "user-1"):
+        data["node_id"] = node_id
+        compact = compact_payload(data)
+        assert compact["N"] == node_id
+        assert expand_payload(compact) == data
+
+
+def test_features_mask():
+    data = encoder_for(UserClaim)(large_claim())
+    compact = compact_payload(data)
+    assert compact["r"][0]["f"] == (1 << len(FeatureFlag.members())) - 1
+
+    # Flags added by a newer version of the library are ignored
+    compact["r"][0]["f"] = (1 << 63) | 1
+    expanded = expand_payload(compact)
+    assert expanded["roles"][0]["enabled_features"] == [
+        FeatureFlag.TIME_SERIES_EVENTS_FEATURE.value
+    ]
+
+
+def test_service_claim():
+    content = ServiceClaim(
+        roles=[OrganizationRole(id=OrganizationId("*"), role=RoleType.OWNER)]
+    )
+    token = Claim.from_claim_type(content, 10).encode(config, compact=True)
+    payload = payload_of(token)
+    assert payload["t"] == "s"
+    assert payload["r"] == [{"t": "o", "i": "*", "r": 4}]
+    assert Claim.from_token(token, config).content == content
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_regular_payloads_with_a_version_claim(lazy):
+    content = claim_from_dict(load_claim("claim_simple_user.json"))
+    payload = dict(encoder_for(UserClaim)(content), v="2020-01", exp=2**31, iat=0)
+    token = jwt.encode(payload, config.key, algorithm=config.algorithm)
+    assert Claim.from_token(token, config, lazy=lazy).content == content
+
+
+def test_unsupported_version():
+    payload = {"v": 2, "t": "u", "i": 1, "r": [], "exp": 2**31, "iat": 0}
+    token = jwt.encode(payload, config.key, algorithm=config.algorithm)
+    with pytest.raises(ValueError):
+        Claim.from_token(token, config)
+
+
+def test_cached_content_tracks_format():
+    claim = Claim.from_claim_type(large_claim(), 10)
+    regular = claim.encode(config, cache_content=True)
+    compact = claim.encode(config, cache_content=True, compact=True)
+    assert "v" in payload_of(compact)
+    assert claim.encode(config) == regular
+    assert json.loads(claim._content_json[2])["v"] == 1
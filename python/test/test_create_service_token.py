@@ -1,6 +1,16 @@
 # -*- coding: utf-8 -*-
 
-from auth_middleware import create_service_jwt_header, JwtConfig
+import datetime
+import threading
+import time
+
+import pytest
+from auth_middleware import (
+    Claim,
+    create_service_jwt_header,
+    JwtConfig,
+    ServiceTokenProvider,
+)
 from auth_middleware.role import OrganizationId
 
 
@@ -8,3 +18,84 @@ def test_create_service_token_header():
     config = JwtConfig("key")
 
     assert create_service_jwt_header(config, OrganizationId(1)) is not None
+
+
+def header_claim(header, config):
+    token = header["Authorization"][len("Bearer ") :]
+    return Claim.from_token(token, config)
+
+
+def test_create_service_token_header_respects_expiry():
+    config = JwtConfig("key")
+    header = create_service_jwt_header(config, OrganizationId(1), expiry_in_minutes=60)
+    claim = header_claim(header, config)
+    remaining = claim.exp - datetime.datetime.fromtimestamp(time.time())
+    assert remaining > datetime.timedelta(minutes=55)
+
+
+def test_provider_reuses_token():
+    config = JwtConfig("key")
+    provider = ServiceTokenProvider()
+    first = create_service_jwt_header(config, OrganizationId(1), provider=provider)
+    second = create_service_jwt_header(config, OrganizationId(1), provider=provider)
+    assert first == second
+    claim = header_claim(first, config)
+    assert claim.is_service_claim
+    assert claim.has_organization_access(OrganizationId(1))
+
+
+def test_provider_keys_tokens():
+    config = JwtConfig("key")
+    provider = ServiceTokenProvider()
+    token = provider.get_token(config, OrganizationId(1))
+    assert provider.get_token(config, OrganizationId(2)) != token
+    assert provider.get_token(config, OrganizationId("*")) != token
+    assert provider.get_token(config, OrganizationId(1), 10) != token
+    assert provider.get_token(JwtConfig("other-key"), OrganizationId(1)) != token
+    assert provider.get_token(config, OrganizationId(1)) == token
+
+
+def test_provider_refreshes_ahead_of_expiry(monkeypatch):
+    config = JwtConfig("key")
+    provider = ServiceTokenProvider(refresh_margin_seconds=60)
+    signed = []
+    encode = Claim.encode
+    monkeypatch.setattr(
+        Claim,
+        "encode",
+        lambda *args, **kwargs: signed.append(args) or encode(*args, **kwargs),
+    )
+    provider.get_token(config, OrganizationId(1))
+
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() + 4 * 60 - 1)
+    provider.get_token(config, OrganizationId(1))
+    assert len(signed) == 1
+    monkeypatch.setattr(time, "time", lambda: real_time() + 4 * 60 + 1)
+    token = provider.get_token(config, OrganizationId(1))
+    assert len(signed) == 2
+    assert header_claim({"Authorization": "Bearer " + token}, config).is_service_claim
+
+
+def test_provider_rejects_margin_longer_than_expiry():
+    provider = ServiceTokenProvider(refresh_margin_seconds=600)
+    with pytest.raises(ValueError):
+        provider.get_token(JwtConfig("key"), OrganizationId(1))
+
+
+def test_provider_is_thread_safe():
+    config = JwtConfig("key")
+    provider = ServiceTokenProvider()
+    tokens = []
+
+    def worker():
+        for _ in range(50):
+            tokens.append(provider.get_token(config, OrganizationId(1)))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(tokens)) == 1
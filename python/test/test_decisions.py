@@ -0,0 +1,140 @@
+import datetime
+
+import pytest
+from auth_middleware import Claim, ClaimCache, DecisionCache, UserClaim
+from auth_middleware.models import DatasetPermission, FeatureFlag, RoleType
+from auth_middleware.role import (
+    DatasetId,
+    DatasetRole,
+    OrganizationId,
+    OrganizationRole,
+    WorkspaceId,
+    WorkspaceRole,
+)
+from test.utils import config
+
+
+def make_content(dataset_role=RoleType.VIEWER):
+    return UserClaim(
+        id=1,
+        roles=[
+            OrganizationRole(
+                id=OrganizationId(1),
+                role=RoleType.OWNER,
+                enabled_features=[FeatureFlag.CONCEPTS_FEATURE],
+                encryption_key_id="key",
+            ),
+            DatasetRole(id=DatasetId(2), role=dataset_role),
+            WorkspaceRole(id=WorkspaceId(3), role=RoleType.EDITOR),
+        ],
+    )
+
+
+def make_claim(seconds=3600, dataset_role=RoleType.VIEWER):
+    return Claim(
+        make_content(dataset_role),
+        datetime.datetime.now() + datetime.timedelta(seconds=seconds),
+    )
+
+
+def ask(claim):
+    return [
+        claim.has_dataset_access(DatasetId(2), DatasetPermission.VIEW_FILES),
+        claim.has_dataset_access(DatasetId(2), DatasetPermission.EDIT_FILES),
+        claim.has_dataset_access(DatasetId(4), DatasetPermission.VIEW_FILES),
+        claim.has_workspace_access(WorkspaceId(3), DatasetPermission.EDIT_FILES),
+        claim.has_feature_enabled(OrganizationId(1), FeatureFlag.CONCEPTS_FEATURE),
+        claim.has_feature_enabled(OrganizationId(1), FeatureFlag.DOI_FEATURE),
+        claim.encryption_key_id(OrganizationId(1)),
+        claim.encryption_key_id(OrganizationId(5)),
+    ]
+
+
+def test_cached_answers_match():
+    expected = ask(make_claim())
+    claim = make_claim()
+    decisions = claim.cache_decisions(stats=True)
+    assert ask(claim) == expected
+    assert ask(claim) == expected
+    assert decisions.stats().misses == len(expected)
+    assert decisions.stats().hits == len(expected)
+    assert decisions.stats().size == len(expected)
+
+
+def test_cached_answers_skip_role_lookups(monkeypatch):
+    claim = make_claim()
+    claim.cache_decisions()
+    ask(claim)
+    monkeypatch.setattr(Claim, "get_role", lambda *args: pytest.fail("lookup"))
+    ask(claim)
+
+
+def test_cache_decisions_returns_existing_cache():
+    claim = make_claim()
+    assert claim.cache_decisions() is claim.cache_decisions(maxsize=10)
+
+
+def test_stats_are_optional():
+    claim = make_claim()
+    decisions = claim.cache_decisions()
+    ask(claim)
+    ask(claim)
+    stats = decisions.stats()
+    assert (stats.hits, stats.misses, stats.size) == (0, 0, 8)
+
+
+def test_cache_is_bounded():
+    claim = make_claim()
+    decisions = claim.cache_decisions(maxsize=3, stats=True)
+    for id_ in range(10):
+        claim.has_dataset_access(DatasetId(id_), DatasetPermission.VIEW_FILES)
+    assert len(decisions) == 3
+    assert decisions.stats().evictions == 7
+    # The most recent answers are kept
+    claim.has_dataset_access(DatasetId(9), DatasetPermission.VIEW_FILES)
+    assert decisions.stats().hits == 1
+
+
+def test_expired_claims_are_not_cached():
+    claim = make_claim(seconds=-1)
+    decisions = claim.cache_decisions(stats=True)
+    ask(claim)
+    ask(claim)
+    assert decisions.stats().hits == 0
+
+
+def test_replacing_exp_or_content_invalidates():
+    claim = make_claim()
+    decisions = claim.cache_decisions(stats=True)
+    ask(claim)
+    claim.exp = claim.exp + datetime.timedelta(seconds=60)
+    ask(claim)
+    assert decisions.stats().hits == 0
+
+    assert claim.has_dataset_access(DatasetId(2), DatasetPermission.EDIT_FILES) is False
+    claim.content = make_content(RoleType.EDITOR)
+    assert claim.has_dataset_access(DatasetId(2), DatasetPermission.EDIT_FILES)
+
+
+def test_keyword_arguments_bypass_the_cache():
+    claim = make_claim()
+    decisions = claim.cache_decisions()
+    assert claim.has_dataset_access(
+        DatasetId(2), permission=DatasetPermission.VIEW_FILES
+    )
+    assert len(decisions) == 0
+
+
+def test_claim_cache_attaches_decision_caches():
+    cache = ClaimCache(decision_cache_size=16)
+    token = make_claim().encode(config)
+    first = Claim.from_token(token, config, cache=cache)
+    second = Claim.from_token(token, config, cache=cache)
+    assert first._decisions is not None
+    assert first._decisions is second._decisions
+    assert first._decisions.maxsize == 16
+
+
+def test_invalid_maxsize():
+    with pytest.raises(ValueError):
+        DecisionCache(maxsize=0)
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+from auth_middleware import UserClaim, ServiceClaim, claim_from_dict
+from auth_middleware.role import role_from_dict, OrganizationRole
+from auth_middleware.models import FeatureFlag
+from test.utils import load_claim
+
+CLAIM_FIXTURES = [
+    name
+    for name in sorted(os.listdir("./resources"))
+    if name.endswith(".json") and "roles" in load_claim(name)
+]
+
+
+def reference_decode(data):
+    cls = UserClaim if data["type"] == "user_claim" else ServiceClaim
+    return cls.from_json(json.dumps(data))
+
+
+def assert_same_ids(left, right):
+    for a, b in zip(left.roles, right.roles):
+        assert type(a) is type(b)
+        assert type(a.id) is type(b.id)
+        assert (a.id.id, a.id.wildcard) == (b.id.id, b.id.wildcard)
+
+
+@pytest.mark.parametrize("name", CLAIM_FIXTURES)
+def test_decoder_matches_dataclasses_json(name):
+    data = load_claim(name)
+    expected = reference_decode(load_claim(name))
+    decoded = claim_from_dict(data)
+    assert decoded == expected
+    assert_same_ids(decoded, expected)
+
+
+def test_decoder_does_not_modify_input():
+    data = load_claim("claim_with_explicit_session.json")
+    claim_from_dict(data)
+    assert data == load_claim("claim_with_explicit_session.json")
+
+
+def test_decoder_defaults_missing_fields():
+    role = role_from_dict([{"role": "owner", "type": "organization_role"}])[0]
+    expected = OrganizationRole.from_json(
+        json.dumps({"role": "owner", "type": "organization_role"})
+    )
+    assert role == expected
+    assert role.enabled_features is None
+
+
+def test_decoder_drops_unknown_features():
+    data = [
+        {
+            "id": 1,
+            "role": "owner",
+            "type": "organization_role",
+            "enabled_features": ["concepts_feature", "unsupported_feature"],
+        }
+    ]
+    role = role_from_dict(data)[0]
+    assert role.enabled_features == (FeatureFlag.CONCEPTS_FEATURE,)
+
+
+def test_decoder_requires_role():
+    with pytest.raises(KeyError):
+        role_from_dict([{"id": 1, "type": "dataset_role"}])
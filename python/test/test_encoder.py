@@ -0,0 +1,88 @@
+import datetime
+import json
+import os
+
+import jwt
+import pytest
+from auth_middleware import Claim, ServiceClaim, UserClaim, claim_from_dict
+from auth_middleware.encoder import encoder_for
+from auth_middleware.models import FeatureFlag, RoleType
+from auth_middleware.role import (
+    DatasetId,
+    DatasetRole,
+    OrganizationId,
+    OrganizationRole,
+    WorkspaceId,
+    WorkspaceRole,
+)
+from auth_middleware.utils import clean_dict
+from test.utils import config, load_claim
+
+CLAIM_FIXTURES = [
+    name for name in sorted(os.listdir("./resources")) if "roles" in load_claim(name)
+]
+
+
+def reference_encode(claim):
+    data = clean_dict(json.loads(claim.content.to_json()))
+    data["exp"] = claim.exp
+    data["iat"] = claim.iat
+    return jwt.encode(data, config.key, algorithm=config.algorithm)
+
+
+def synthetic_claims():
+    yield UserClaim(
+        id=1,
+        roles=[
+            OrganizationRole(
+                id=OrganizationId("*"),
+                role=RoleType.OWNER,
+                node_id="N:organization:1",
+                enabled_features=FeatureFlag.values(),
+                encryption_key_id="key-id",
+            ),
+            DatasetRole(id=DatasetId(2), role=RoleType.EDITOR, locked=False),
+            DatasetRole(id=DatasetId("*"), role=RoleType.VIEWER, locked=True),
+            WorkspaceRole(id=WorkspaceId(3), role=RoleType.GUEST),
+        ],
+        cognito="raw-session",
+        node_id="N:user:1",
+    )
+    yield ServiceClaim(roles=[])
+    yield ServiceClaim(
+        roles=[OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER)]
+    )
+
+
+@pytest.mark.parametrize("name", CLAIM_FIXTURES)
+def test_encode_fixture_matches_reference(name):
+    claim = Claim.from_claim_type(claim_from_dict(load_claim(name)), 10)
+    assert claim.encode(config) == reference_encode(claim)
+
+
+@pytest.mark.parametrize("content", list(synthetic_claims()))
+def test_encode_matches_reference(content):
+    claim = Claim.from_claim_type(content, 10)
+    assert claim.encode(config) == reference_encode(claim)
+
+
+def test_encoder_matches_to_json():
+    for content in synthetic_claims():
+        assert encoder_for(type(content))(content) == clean_dict(
+            json.loads(content.to_json())
+        )
+
+
+def test_encode_cached_content():
+    claim = Claim.from_claim_type(list(synthetic_claims())[0], 10)
+    first = claim.encode(config, cache_content=True)
+    assert claim._content_json[0] is claim.content
+
+    claim.exp = claim.exp + datetime.timedelta(seconds=60)
+    second = claim.encode(config, cache_content=True)
+    assert second != first
+    assert second == reference_encode(claim)
+    assert Claim.from_token(second, config).head_organization_id == OrganizationId("*")
+
+    claim.content = ServiceClaim(roles=[])
+    assert claim.encode(config) == reference_encode(claim)
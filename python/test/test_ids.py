@@ -0,0 +1,84 @@
+import copy
+import pickle
+
+import pytest
+from auth_middleware.role import DatasetId, Id, OrganizationId, WorkspaceId
+
+ID_TYPES = [Id, DatasetId, OrganizationId, WorkspaceId]
+
+
+@pytest.mark.parametrize("id_type", ID_TYPES)
+def test_parsing(id_type):
+    assert (id_type(12).id, id_type(12).wildcard) == (12, "")
+    assert (id_type("12").id, id_type("12").wildcard) == (12, "")
+    assert (id_type("*").id, id_type("*").wildcard) == (-1, "*")
+    assert (id_type("N:1").id, id_type("N:1").wildcard) == (-1, "N:1")
+    assert id_type(-5).id == -5
+    assert type(id_type(1)) is id_type
+
+
+@pytest.mark.parametrize("id_type", ID_TYPES)
+def test_small_ids_and_wildcard_are_shared(id_type):
+    assert id_type(1) is id_type(1)
+    assert id_type("1") is id_type(1)
+    assert id_type.from_int(1) is id_type(1)
+    assert id_type("*") is id_type("*")
+    big = 10**9
+    assert id_type(big) == id_type.from_int(big)
+
+
+def test_shared_instances_are_bounded():
+    # Ids parsed from request strings must not grow the shared instances
+    DatasetId(1)
+    before = len(DatasetId._instances)
+    for zeros in range(1, 50):
+        for id_ in (1, 2, 5000):
+            assert DatasetId("0" * zeros + str(id_)) == DatasetId(id_)
+        DatasetId("N:dataset:{}".format(zeros))
+    # At most one new entry, for the int 2
+    assert len(DatasetId._instances) <= before + 1
+    assert all(type(key) is int or key == "*" for key in DatasetId._instances)
+
+
+def test_bool_ids_are_ints():
+    assert type(DatasetId(True).id) is int
+
+
+def test_instances_are_per_type():
+    assert DatasetId(1) is not OrganizationId(1)
+    assert DatasetId(1) != OrganizationId(1)
+    assert type(DatasetId("*")) is DatasetId
+    assert type(WorkspaceId.from_int(3)) is WorkspaceId
+
+
+def test_equality_and_hash():
+    assert DatasetId(10**9) == DatasetId(str(10**9))
+    assert hash(DatasetId(10**9)) == hash(DatasetId(str(10**9)))
+    assert len({DatasetId(1), DatasetId("1"), OrganizationId(1)}) == 2
+    # Non numeric ids compare by their id only
+    assert DatasetId("*") == DatasetId("other")
+
+
+def test_matches():
+    assert DatasetId(1).matches(DatasetId(1))
+    assert not DatasetId(1).matches(DatasetId(2))
+    assert DatasetId("*").matches(DatasetId(2))
+    assert not DatasetId(2).matches(DatasetId("*"))
+    assert not DatasetId("*").matches(OrganizationId(2))
+
+
+def test_immutable():
+    with pytest.raises(AttributeError):
+        DatasetId(1).id = 2
+
+
+@pytest.mark.parametrize(
+    "value", [DatasetId(1), DatasetId(10**9), DatasetId("*"), OrganizationId("x")]
+)
+def test_copy_and_pickle(value):
+    for copied in (copy.copy(value), copy.deepcopy(value)):
+        assert copied is value
+    unpickled = pickle.loads(pickle.dumps(value))
+    assert unpickled == value
+    assert unpickled.wildcard == value.wildcard
+    assert type(unpickled) is type(value)
@@ -0,0 +1,114 @@
+import json
+import os
+import subprocess
+import sys
+
+import auth_middleware
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing every module of the package, and dataclasses_json, as the package
+# did before its imports were made lazy.
+EAGER_IMPORT = """
+import importlib, pkgutil, dataclasses_json, auth_middleware
+for module in pkgutil.iter_modules(auth_middleware.__path__):
+    try:
+        importlib.import_module("auth_middleware." + module.name)
+    except ImportError:
+        pass
+"""
+
+
+def run_python(code, *args, env=None):
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        cwd=ROOT,
+        env=dict(os.environ, **(env or {})),
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def imported_modules(code):
+    result = run_python(
+        code + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))"
+    )
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_package_import_is_lazy():
+    modules = imported_modules("import auth_middleware")
+    assert {m for m in modules if m.startswith("auth_middleware")} == {
+        "auth_middleware",
+        "auth_middleware.version",
+    }
+    assert "jwt" not in modules
+
+
+def test_dataclasses_json_is_not_imported_to_verify_tokens():
+    modules = imported_modules(
+        "from auth_middleware import Claim, JwtConfig, UserClaim\n"
+        "config = JwtConfig('secret')\n"
+        "content = UserClaim(id=1, roles=[])\n"
+        "Claim.from_token(Claim.from_claim_type(content, 60).encode(config), config)"
+    )
+    assert "auth_middleware.claim" in modules
+    assert "dataclasses_json" not in modules
+    assert "marshmallow" not in modules
+
+
+def import_time(code, env):
+    """
+    Total import time of ``code``, in seconds: the best of a few runs.
+    """
+    # Compile the bytecode once
+    run_python(code, env=env)
+    timings = []
+    for _ in range(3):
+        result = run_python(code, "-X", "importtime", env=env)
+        total = 0
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "self" not in line:
+                _, cumulative_us, name = line[len("import time:") :].split("|")
+                # Top-level imports only, nested ones are in their cumulative time
+                if not name[1:].startswith(" "):
+                    total += int(cumulative_us)
+        timings.append(total / 1e6)
+    return min(timings)
+
+
+def test_import_time_is_below_the_eager_import(tmp_path):
+    env = {"PYTHONDONTWRITEBYTECODE": "", "PYTHONPYCACHEPREFIX": str(tmp_path)}
+    lazy = import_time("from auth_middleware import Claim, JwtConfig", env)
+    assert lazy < import_time(EAGER_IMPORT, env)
+
+
+def test_lazy_attributes():
+    assert auth_middleware.Claim is auth_middleware.claim.Claim
+    assert auth_middleware.PennsieveRole is auth_middleware.models.Role
+    assert set(auth_middleware.__all__) <= set(dir(auth_middleware))
+    for name in auth_middleware.__all__:
+        assert getattr(auth_middleware, name) is not None
+    with pytest.raises(AttributeError):
+        auth_middleware.not_a_name
+
+
+def test_star_import():
+    namespace = {}
+    exec("from auth_middleware import *", namespace)
+    assert namespace["Claim"] is auth_middleware.Claim
+    assert namespace["RoleType"] is auth_middleware.models.RoleType
+
+
+def test_dataclass_json_methods_are_added_on_first_use():
+    from auth_middleware.role import WorkspaceId, WorkspaceRole
+    from auth_middleware.models import RoleType
+
+    role = WorkspaceRole(id=WorkspaceId(3), role=RoleType.EDITOR)
+    assert WorkspaceRole.from_json(role.to_json()) == role
+    assert WorkspaceRole.from_dict(role.to_dict()) == role
+    assert WorkspaceRole.schema() is not None
+    assert "to_json" in WorkspaceRole.__dict__
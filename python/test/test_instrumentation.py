@@ -0,0 +1,246 @@
+import json
+import time
+
+import jwt
+import pytest
+from auth_middleware import Claim, ClaimCache, JwtConfig, JwtKeyRing
+from auth_middleware.instrumentation import (
+    Instrumentation,
+    get_instrumentation,
+    set_instrumentation,
+)
+from auth_middleware.models import DatasetPermission, RoleType
+from auth_middleware.role import DatasetId, OrganizationId
+from auth_middleware.verify import (
+    decode,
+    parse_payload,
+    validate_registered_claims,
+    verify_signature,
+)
+from test.utils import config, make_token
+
+
+class Recorder(Instrumentation):
+    def __init__(self):
+        self.verified = []
+        self.rejected = []
+        self.cache = []
+        self.checks = []
+
+    def token_verified(self, timings, token_size, role_count):
+        self.verified.append((timings, token_size, role_count))
+
+    def token_rejected(self, reason, token_size):
+        self.rejected.append(reason)
+
+    def cache_lookup(self, outcome):
+        self.cache.append(outcome)
+
+    def permission_checked(self, check, granted, seconds):
+        self.checks.append((check, granted))
+
+
+@pytest.fixture
+def recorder():
+    recorder = Recorder()
+    set_instrumentation(recorder)
+    yield recorder
+    set_instrumentation(None)
+
+
+def payload_token(payload):
+    return jwt.encode(payload, config.key, algorithm=config.algorithm)
+
+
+def test_disabled_by_default():
+    assert not get_instrumentation().enabled
+
+
+def test_token_verified(recorder):
+    token = make_token(roles=3)
+    Claim.from_token(token, config)
+    ((timings, token_size, role_count),) = recorder.verified
+    assert timings.signature > 0 and timings.parse > 0 and timings.decode > 0
+    assert token_size == len(token)
+    assert role_count == 3
+
+
+@pytest.mark.parametrize(
+    "token, reason",
+    [
+        (make_token(seconds=-10), "expired"),
+        (make_token(token_config=JwtConfig("other-key")), "invalid_signature"),
+        ("not-a-token", "malformed"),
+        (
+            payload_token({"type": "temporary", "exp": 2**31, "iat": 0}),
+            "invalid_claim",
+        ),
+        (
+            payload_token({"type": "user_claim", "exp": 2**31, "nbf": 2**31}),
+            "not_yet_valid",
+        ),
+    ],
+)
+def test_token_rejected(recorder, token, reason):
+    with pytest.raises(Exception):
+        Claim.from_token(token, config)
+    assert recorder.rejected == [reason]
+    assert recorder.verified == []
+
+
+def test_unknown_key_rejected(recorder):
+    ring = JwtKeyRing([JwtConfig("secret", kid="a")], active_kid="a")
+    with pytest.raises(jwt.InvalidTokenError):
+        Claim.from_token(make_token(token_config=JwtConfig("x", kid="b")), ring)
+    assert recorder.rejected == ["unknown_key"]
+
+
+def test_cache_lookups(recorder):
+    cache = ClaimCache()
+    token = make_token(seconds=1)
+    Claim.from_token(token, config, cache=cache)
+    Claim.from_token(token, config, cache=cache)
+    cache._entries[next(iter(cache._entries))] = (None, time.time() - 1)
+    Claim.from_token(token, config, cache=cache)
+    assert recorder.cache == ["miss", "hit", "expired"]
+    assert len(recorder.verified) == 2
+
+
+def test_permission_checks(recorder):
+    claim = Claim.from_token(make_token(role=RoleType.VIEWER), config)
+    assert claim.has_dataset_access(DatasetId(1), DatasetPermission.VIEW_FILES)
+    assert not claim.has_dataset_access(DatasetId(1), DatasetPermission.DELETE_DATASET)
+    assert not claim.has_organization_access(OrganizationId(1))
+    assert recorder.checks == [
+        ("has_dataset_access", True),
+        ("has_dataset_access", False),
+        ("has_organization_access", False),
+    ]
+
+
+def jwt_decode(token):
+    try:
+        return jwt.decode(token, config.key, algorithms=[config.algorithm])
+    except jwt.PyJWTError as e:
+        return type(e)
+
+
+def split_decode(token):
+    try:
+        data = parse_payload(verify_signature(token, config))
+        validate_registered_claims(data)
+        return data
+    except jwt.PyJWTError as e:
+        return type(e)
+
+
+def user_claim_token(**claims):
+    payload = {"type": "user_claim", "id": 1, "roles": [], "exp": 2**31, "iat": 0}
+    # Signed as is: newer versions of `jwt.encode` reject some of these claims
+    payload = json.dumps(dict(payload, **claims)).encode("utf-8")
+    return jwt.api_jws.encode(payload, config.key, algorithm=config.algorithm)
+
+
+# Registered claims checked differently across PyJWT versions (newer ones
+# reject an `iat` in the future, and a non-string `sub` or `jti`)
+REGISTERED_CLAIMS = [
+    user_claim_token(),
+    user_claim_token(iat=2**31),
+    user_claim_token(iat="now"),
+    user_claim_token(exp=0),
+    user_claim_token(nbf=2**31),
+    user_claim_token(sub=1),
+    user_claim_token(sub="N:user:1"),
+    user_claim_token(jti=1),
+    user_claim_token(iss=1),
+    user_claim_token(aud="someone"),
+]
+
+
+@pytest.mark.parametrize("instrumented", [False, True])
+@pytest.mark.parametrize("token", REGISTERED_CLAIMS)
+def test_from_token_matches_installed_jwt_decode(token, instrumented):
+    if instrumented:
+        set_instrumentation(Recorder())
+    try:
+        result = Claim.from_token(token, config)
+    except jwt.PyJWTError as e:
+        result = type(e)
+    finally:
+        set_instrumentation(None)
+    expected = jwt_decode(token)
+    if isinstance(expected, dict):
+        assert isinstance(result, Claim)
+    else:
+        assert result is expected
+
+
+@pytest.mark.parametrize(
+    "token",
+    REGISTERED_CLAIMS
+    + [
+        make_token(),
+        make_token(seconds=-10),
+        make_token(token_config=JwtConfig("other-key")),
+        "not-a-token",
+        payload_token({"exp": 2**31, "iat": 0}),
+        payload_token({"exp": "soon"}),
+        payload_token({"iat": "now"}),
+        payload_token({"nbf": 2**31}),
+        payload_token({"nbf": 0}),
+        payload_token({"aud": "someone"}),
+        jwt.api_jws.encode(b"[1, 2]", config.key, algorithm=config.algorithm),
+        jwt.api_jws.encode(b"{not json", config.key, algorithm=config.algorithm),
+    ],
+)
+def test_split_verification_matches_jwt_decode(token):
+    expected = jwt_decode(token)
+    assert split_decode(token) == expected
+    try:
+        assert decode(token, config) == expected
+    except jwt.PyJWTError as e:
+        assert type(e) is expected
+
+
+def test_prometheus_adapter():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    from auth_middleware.instrumentation import PrometheusInstrumentation
+
+    registry = prometheus_client.CollectorRegistry()
+    set_instrumentation(PrometheusInstrumentation(registry=registry))
+    try:
+        claim = Claim.from_token(make_token(), config)
+        claim.has_dataset_access(DatasetId(1), DatasetPermission.VIEW_FILES)
+        with pytest.raises(jwt.ExpiredSignatureError):
+            Claim.from_token(make_token(seconds=-10), config)
+    finally:
+        set_instrumentation(None)
+
+    sample = registry.get_sample_value
+    assert sample("auth_middleware_token_roles_count") == 1
+    assert sample("auth_middleware_tokens_rejected_total", {"reason": "expired"}) == 1
+    assert (
+        sample(
+            "auth_middleware_permission_checks_total",
+            {"check": "has_dataset_access", "granted": "true"},
+        )
+        == 1
+    )
+
+
+def test_opentelemetry_adapter():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from auth_middleware.instrumentation import OpenTelemetryInstrumentation
+
+    reader = InMemoryMetricReader()
+    meter = MeterProvider(metric_readers=[reader]).get_meter("test")
+    set_instrumentation(OpenTelemetryInstrumentation(meter))
+    try:
+        Claim.from_token(make_token(), config)
+    finally:
+        set_instrumentation(None)
+
+    metrics = reader.get_metrics_data().resource_metrics[0].scope_metrics[0].metrics
+    assert "auth_middleware.token.phase.duration" in {m.name for m in metrics}
@@ -0,0 +1,128 @@
+import pytest
+from auth_middleware import Claim, claim_from_dict
+from auth_middleware.models import FeatureFlag
+from auth_middleware.role import (
+    OrganizationId,
+    RoleInternPool,
+    get_role_intern_pool,
+    role_from_dict,
+    set_role_intern_pool,
+)
+from test.utils import load_claim
+
+
+@pytest.fixture
+def pool():
+    previous = get_role_intern_pool()
+    pool = RoleInternPool(maxsize=4)
+    set_role_intern_pool(pool)
+    yield pool
+    set_role_intern_pool(previous)
+
+
+def organization_role(id_=1, **extra):
+    role = {
+        "type": "organization_role",
+        "id": id_,
+        "role": "owner",
+        "enabled_features": ["concepts_feature", "doi_feature"],
+        "encryption_key_id": "arn:aws:iam::111122223333:role/KMSAdminRole",
+    }
+    role.update(extra)
+    return role
+
+
+def test_identical_roles_are_shared(pool):
+    first = claim_from_dict(load_claim("claim_complex_roles.json"))
+    second = claim_from_dict(load_claim("claim_complex_roles.json"))
+    assert first == second
+    assert all(a is b for a, b in zip(first.roles, second.roles))
+    assert pool.hits == len(first.roles)
+
+
+def test_different_roles_are_not_shared(pool):
+    roles = role_from_dict(
+        [
+            organization_role(),
+            organization_role(2),
+            organization_role(role="viewer"),
+            organization_role(enabled_features=["concepts_feature"]),
+            organization_role(node_id=None),
+        ]
+    )
+    assert len({id(role) for role in roles}) == len(roles)
+    # A missing node id and an explicit null decode to the same role, but are
+    # interned separately
+    assert roles[0] == roles[4]
+
+
+def test_pool_is_bounded(pool):
+    role_from_dict([organization_role(i) for i in range(10)])
+    assert len(pool) == 4
+    assert pool.misses == 10
+    # The most recent roles are kept
+    (role,) = role_from_dict([organization_role(9)])
+    assert pool.hits == 1
+
+
+def test_unhashable_values_are_not_interned(pool):
+    data = organization_role(enabled_features=[{"unknown": "flag"}])
+    first, second = role_from_dict([data, data])
+    assert first == second and first is not second
+    assert first.enabled_features == ()
+    assert len(pool) == 0
+
+
+def test_disabled_pool():
+    previous = get_role_intern_pool()
+    set_role_intern_pool(None)
+    try:
+        first, second = role_from_dict([organization_role(), organization_role()])
+    finally:
+        set_role_intern_pool(previous)
+    assert first == second and first is not second
+
+
+def test_lazy_claims_share_roles(pool):
+    data = dict(load_claim("claim_complex_roles.json"), exp=2**31, iat=0)
+    eager = Claim.from_dict(dict(data))
+    lazy = Claim.from_dict(dict(data), lazy=True)
+    assert lazy.get_role(OrganizationId(1)) is eager.get_role(OrganizationId(1))
+
+
+def test_enabled_features_are_copied(pool):
+    data = {
+        "type": "user_claim",
+        "id": 1,
+        "roles": [organization_role()],
+        "exp": 2**31,
+        "iat": 0,
+    }
+    first = Claim.from_dict(dict(data))
+    first.enabled_features(OrganizationId(1)).append(FeatureFlag.OLD_ETL)
+    second = Claim.from_dict(dict(data))
+    assert second.enabled_features(OrganizationId(1)) == [
+        FeatureFlag.CONCEPTS_FEATURE,
+        FeatureFlag.DOI_FEATURE,
+    ]
+
+
+def test_shared_features_are_immutable(pool):
+    first, second = role_from_dict([organization_role(), organization_role()])
+    assert first is second
+    assert isinstance(first.enabled_features, tuple)
+
+
+@pytest.mark.parametrize(
+    "extra,other",
+    [
+        ({"locked": True}, {"locked": 1}),
+        ({"id": 1}, {"id": 1.0}),
+        ({"node_id": None}, {"node_id": 0}),
+    ],
+)
+def test_values_of_different_json_types_are_not_shared(pool, extra, other):
+    role = {"type": "dataset_role", "id": 1, "role": "viewer", "locked": False}
+    first, second = role_from_dict([dict(role, **extra), dict(role, **other)])
+    assert first is not second
+    assert pool.misses == 2
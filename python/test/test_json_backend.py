@@ -0,0 +1,119 @@
+import json
+
+import jwt
+import pytest
+from auth_middleware import Claim, claim_from_dict
+from auth_middleware.encoder import encoder_for
+from auth_middleware import json_backend
+from auth_middleware.json_backend import (
+    BACKENDS,
+    JsonBackend,
+    get_json_backend,
+    load_backend,
+    set_json_backend,
+)
+from auth_middleware.verify import parse_payload
+from benchmarks.cases import load_fixtures, synthetic_claim
+from test.utils import config, make_token
+
+
+def installed_backends():
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+@pytest.fixture(params=installed_backends())
+def backend(request):
+    previous = get_json_backend()
+    set_json_backend(request.param)
+    yield get_json_backend()
+    set_json_backend(previous.name)
+
+
+def contents():
+    yield "roles=100", synthetic_claim(100)
+    for name, data in sorted(load_fixtures().items()):
+        yield name, claim_from_dict(data)
+
+
+@pytest.mark.parametrize("name,content", list(contents()))
+def test_tokens_are_the_same_with_every_backend(backend, name, content):
+    claim = Claim.from_claim_type(content, 3600)
+    for compact in (False, True):
+        token = claim.encode(config, compact=compact)
+        set_json_backend("json")
+        assert token == claim.encode(config, compact=compact)
+        set_json_backend(backend.name)
+        assert Claim.from_token(token, config).content == content
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        {"node_id": "N:user:é", "path": "a/b"},
+        {"id": 2**70},
+        {1: "non-str key"},
+        {"exp": 1.5, "nested": [None, True, {"x": []}]},
+    ],
+)
+def test_dumps_matches_the_standard_library(backend, value):
+    assert backend.dumps(value) == json.dumps(value, separators=(",", ":"))
+
+
+@pytest.mark.parametrize(
+    "document",
+    [b'{"id": 12, "node_id": "N:user:\\u00e9"}', b'{"id": 1e400}', b'{"id": NaN}'],
+)
+def test_loads_matches_the_standard_library(backend, document):
+    assert repr(backend.loads(document)) == repr(json.loads(document))
+
+
+def test_dumps_rejects_what_the_standard_library_rejects(backend):
+    with pytest.raises(TypeError):
+        backend.dumps({"value": object()})
+
+
+@pytest.mark.parametrize("payload", [b"{", b"[1, 2]", b"\xff"])
+def test_invalid_payloads(backend, payload):
+    with pytest.raises(jwt.DecodeError):
+        parse_payload(payload)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_json_backend("simplejson")
+
+
+def test_default_backend_is_the_fastest_installed():
+    assert load_backend().name == installed_backends()[0]
+
+
+def test_claim_content_is_encoded_like_the_dataclass(backend):
+    content = synthetic_claim(10)
+    token = Claim.from_claim_type(content, 3600).encode(config)
+    payload = jwt.decode(token, config.key, algorithms=[config.algorithm])
+    assert {k: v for k, v in payload.items() if k not in ("exp", "iat")} == (
+        encoder_for(type(content))(content)
+    )
+
+
+def test_from_token_parses_payloads_with_the_backend(monkeypatch):
+    parsed = []
+    backend = get_json_backend()
+
+    def loads(data):
+        parsed.append(data)
+        return backend.loads(data)
+
+    monkeypatch.setattr(
+        json_backend, "_backend", JsonBackend("recording", loads, backend.dumps)
+    )
+    claim = Claim.from_token(make_token(), config)
+    assert len(parsed) == 1
+    assert claim.head_dataset_id is not None
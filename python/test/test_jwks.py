@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+
+import pytest
+from auth_middleware import Claim, JwtConfig, UnknownKeyError
+from auth_middleware.jwks import JwksKeySource, parse_jwks
+from auth_middleware.role import DatasetId
+from test.utils import make_token
+
+pytest.importorskip("cryptography")
+from cryptography.hazmat.primitives.asymmetric import ec, rsa  # noqa: E402
+from jwt.algorithms import RSAAlgorithm  # noqa: E402
+from jwt.utils import base64url_encode  # noqa: E402
+
+RSA_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+EC_KEY = ec.generate_private_key(ec.SECP256R1())
+
+
+def rsa_jwk(kid, key=RSA_KEY, **extra):
+    jwk = json.loads(RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update(kid=kid, **extra)
+    return jwk
+
+
+def ec_jwk(kid, key=EC_KEY):
+    numbers = key.public_key().public_numbers()
+    return {
+        "kty": "EC",
+        "crv": "P-256",
+        "kid": kid,
+        "x": base64url_encode(numbers.x.to_bytes(32, "big")).decode("ascii"),
+        "y": base64url_encode(numbers.y.to_bytes(32, "big")).decode("ascii"),
+    }
+
+
+def write_jwks(path, *keys):
+    path.write_text(json.dumps({"keys": list(keys)}))
+
+
+class CountingFetch:
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"keys": list(self.keys)}
+
+
+def test_parse_jwks_skips_unusable_keys():
+    configs = parse_jwks(
+        {
+            "keys": [
+                rsa_jwk("rsa", alg="RS256"),
+                ec_jwk("ec"),
+                rsa_jwk("encryption", use="enc"),
+                {"kty": "RSA", "n": "AQAB", "e": "AQAB"},
+                {"kty": "unknown", "kid": "unknown"},
+                {"kty": "EC", "kid": "broken", "crv": "P-256", "x": "", "y": ""},
+            ]
+        }
+    )
+    assert sorted(configs) == ["ec", "rsa"]
+    assert configs["rsa"].algorithm == "RS256"
+    assert configs["ec"].algorithm == "ES256"
+    with pytest.raises(ValueError):
+        parse_jwks("{}")
+
+
+def test_verifies_by_kid_from_file(tmp_path):
+    path = tmp_path / "jwks.json"
+    write_jwks(path, rsa_jwk("rsa"), ec_jwk("ec"))
+    with JwksKeySource.from_file(str(path)) as source:
+        assert sorted(source.kids) == ["ec", "rsa"]
+        for key, algorithm, kid in ((RSA_KEY, "RS256", "rsa"), (EC_KEY, "ES256", "ec")):
+            token = make_token(
+                token_config=JwtConfig(key, algorithm=algorithm, kid=kid)
+            )
+            assert Claim.from_token(token, source).head_dataset_id == DatasetId(1)
+
+
+def test_rejects_tokens_without_known_kid():
+    source = JwksKeySource(CountingFetch(rsa_jwk("rsa")), background=False)
+    with pytest.raises(UnknownKeyError):
+        Claim.from_token(
+            make_token(token_config=JwtConfig(RSA_KEY, algorithm="RS256")), source
+        )
+    with pytest.raises(ValueError):
+        make_token(token_config=source)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_unknown_kid_triggers_one_rate_limited_refresh(background):
+    fetch = CountingFetch(rsa_jwk("old"))
+    source = JwksKeySource(fetch, background=background, min_refresh_interval=0)
+    assert fetch.calls == 1
+
+    # A new key is published: the first token signed with it is rejected and
+    # refreshes the keys in the background, for the next ones to be accepted
+    fetch.keys.append(rsa_jwk("new"))
+    token = make_token(token_config=JwtConfig(RSA_KEY, algorithm="RS256", kid="new"))
+    with pytest.raises(UnknownKeyError):
+        Claim.from_token(token, source)
+    assert wait_for(lambda: "new" in source.kids)
+    assert Claim.from_token(token, source).head_dataset_id == DatasetId(1)
+    assert fetch.calls == 2
+
+    source.min_refresh_interval = 60
+    unknown = make_token(
+        token_config=JwtConfig(RSA_KEY, algorithm="RS256", kid="unknown")
+    )
+    for _ in range(3):
+        with pytest.raises(UnknownKeyError):
+            Claim.from_token(unknown, source)
+    time.sleep(0.05)
+    assert fetch.calls == 2
+    source.close()
+
+
+def test_unknown_kid_never_waits_for_a_fetch():
+    fetch = CountingFetch(rsa_jwk("rsa"))
+    source = JwksKeySource(fetch, background=False, min_refresh_interval=0)
+    release = threading.Event()
+
+    def slow_fetch():
+        release.wait(5)
+        return fetch()
+
+    source.fetch = slow_fetch
+    try:
+        for _ in range(2):
+            # The first lookup starts a refresh, the second finds it running
+            started = time.monotonic()
+            with pytest.raises(UnknownKeyError):
+                source.verification_config("other")
+            assert time.monotonic() - started < 0.5
+        # Known keys are still served while the fetch is in progress
+        assert source.verification_config("rsa").kid == "rsa"
+    finally:
+        release.set()
+    assert wait_for(lambda: fetch.calls == 2)
+
+
+def test_failed_refresh_keeps_keys():
+    fetch = CountingFetch(rsa_jwk("rsa"))
+    source = JwksKeySource(fetch, background=False, min_refresh_interval=0)
+    failures = []
+
+    def fail():
+        failures.append(1)
+        raise OSError("unreachable")
+
+    source.fetch = fail
+    with pytest.raises(UnknownKeyError):
+        source.verification_config("other")
+    assert wait_for(lambda: failures)
+    with pytest.raises(OSError):
+        source.refresh()
+    assert source.kids == ["rsa"]
+
+
+def test_initial_fetch_failure_raises(tmp_path):
+    with pytest.raises(OSError):
+        JwksKeySource.from_file(str(tmp_path / "missing.json"))
+
+
+def test_background_refresh(tmp_path):
+    path = tmp_path / "jwks.json"
+    write_jwks(path, rsa_jwk("old"))
+    with JwksKeySource.from_file(str(path), refresh_interval=0.01) as source:
+        write_jwks(path, rsa_jwk("old"), rsa_jwk("new"))
+        deadline = time.monotonic() + 5
+        while "new" not in source.kids and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "new" in source.kids
+    assert source._thread is None
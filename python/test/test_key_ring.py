@@ -0,0 +1,86 @@
+import jwt
+import pytest
+from auth_middleware import (
+    Claim,
+    ClaimCache,
+    JwtConfig,
+    JwtKeyRing,
+    UnknownKeyError,
+)
+from auth_middleware.role import DatasetId
+from test.utils import config, make_claim
+
+old = JwtConfig("old-secret", kid="2021-01")
+new = JwtConfig("new-secret", kid="2021-02")
+
+
+def test_encode_stamps_kid():
+    token = make_claim().encode(new)
+    assert jwt.get_unverified_header(token) == {
+        "typ": "JWT",
+        "alg": "HS256",
+        "kid": "2021-02",
+    }
+    assert "kid" not in jwt.get_unverified_header(make_claim().encode(config))
+
+
+def test_key_ring_signs_with_active_key():
+    ring = JwtKeyRing([old, new], active_kid="2021-02")
+    token = make_claim().encode(ring)
+    assert jwt.get_unverified_header(token)["kid"] == "2021-02"
+    assert Claim.from_token(token, new).head_dataset_id == DatasetId(1)
+
+
+def test_key_ring_verifies_with_kid_key():
+    ring = JwtKeyRing([old, new], active_kid="2021-02")
+    for key in (old, new):
+        token = make_claim().encode(key)
+        assert Claim.from_token(token, ring).head_dataset_id == DatasetId(1)
+
+
+def test_key_ring_rejects_unknown_kid():
+    ring = JwtKeyRing([new], active_kid="2021-02")
+    with pytest.raises(UnknownKeyError):
+        Claim.from_token(make_claim().encode(old), ring)
+    with pytest.raises(UnknownKeyError):
+        Claim.from_token(make_claim().encode(JwtConfig("new-secret")), ring)
+
+
+def test_key_ring_rejects_forged_kid():
+    forged = JwtConfig("attacker-secret", kid="2021-02")
+    ring = JwtKeyRing([old, new], active_kid="2021-02")
+    with pytest.raises(jwt.InvalidSignatureError):
+        Claim.from_token(make_claim().encode(forged), ring)
+
+
+def test_key_ring_default_kid():
+    ring = JwtKeyRing([JwtConfig("secret-key", kid="legacy"), new], "2021-02", "legacy")
+    token = make_claim().encode(config)
+    assert Claim.from_token(token, ring).head_dataset_id == DatasetId(1)
+
+
+def test_key_ring_with_cache():
+    ring = JwtKeyRing([old, new], active_kid="2021-02")
+    cache = ClaimCache()
+    token = make_claim().encode(old)
+    assert Claim.from_token(token, ring, cache=cache) is Claim.from_token(
+        token, ring, cache=cache
+    )
+    assert cache.stats().hits == 1
+
+
+def test_key_ring_validation():
+    with pytest.raises(ValueError):
+        JwtKeyRing([config], active_kid="x")
+    with pytest.raises(ValueError):
+        JwtKeyRing([old, JwtConfig("other", kid="2021-01")], active_kid="2021-01")
+    with pytest.raises(ValueError):
+        JwtKeyRing([old], active_kid="2021-02")
+
+
+def test_prepared_key_is_reused():
+    key = JwtConfig("secret", kid="a")
+    assert key.signing_key is key.signing_key
+    assert key.verification_key is key.signing_key
+    assert key == JwtConfig("secret", kid="a")
+    assert hash(key) == hash(JwtConfig("secret", kid="a"))
@@ -0,0 +1,190 @@
+import copy
+import pickle
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+import pytest
+from auth_middleware import Claim, ServiceClaim, UserClaim, claim_from_dict
+from auth_middleware.config import JwtConfig
+from auth_middleware.role import (
+    DatasetRole,
+    OrganizationRole,
+    WorkspaceRole,
+    OrganizationId,
+    DatasetId,
+    WorkspaceId,
+)
+from auth_middleware.models import DatasetPermission, FeatureFlag, RoleType
+from test.utils import load_claim, config
+
+
+def make_claim():
+    data = UserClaim(
+        id=12345,
+        roles=[
+            OrganizationRole(
+                id=OrganizationId(1),
+                role=RoleType.OWNER,
+                node_id="N:organization:1",
+                enabled_features=[FeatureFlag.CONCEPTS_FEATURE],
+                encryption_key_id="key-id",
+            ),
+            DatasetRole(id=DatasetId(4), role=RoleType.VIEWER),
+            DatasetRole(id=DatasetId(2), role=RoleType.OWNER, node_id="N:dataset:2"),
+            WorkspaceRole(id=WorkspaceId(3), role=RoleType.EDITOR),
+        ],
+        node_id="N:user:12345",
+    )
+    return Claim.from_claim_type(data, 10)
+
+
+def decoded_count(claim):
+    return sum(role is not None for role in claim.role_index._decoded)
+
+
+def test_lazy_claim_equals_eager_claim():
+    token = make_claim().encode(config)
+    lazy = Claim.from_token(token, config, lazy=True)
+    eager = Claim.from_token(token, config)
+    assert lazy == eager
+    assert lazy.content == eager.content
+
+
+def test_lazy_claim_decodes_roles_on_demand():
+    token = make_claim().encode(config)
+    claim = Claim.from_token(token, config, lazy=True)
+    assert claim.is_user_claim
+    assert not claim.is_service_claim
+    assert decoded_count(claim) == 0
+
+    assert claim.head_organization_id == OrganizationId(1)
+    assert decoded_count(claim) == 1
+    assert claim.enabled_features(OrganizationId(1)) == [FeatureFlag.CONCEPTS_FEATURE]
+    assert claim.encryption_key_id(OrganizationId(1)) == "key-id"
+    assert decoded_count(claim) == 1
+
+    assert claim.has_dataset_access(DatasetId(2), DatasetPermission.DELETE_DATASET)
+    assert claim.has_dataset_access(DatasetId(4), DatasetPermission.VIEW_FILES)
+    assert not claim.has_dataset_access(DatasetId(4), DatasetPermission.EDIT_FILES)
+    assert decoded_count(claim) == 3
+    assert claim._payload is not None
+
+
+def test_lazy_claim_content_reuses_decoded_roles():
+    token = make_claim().encode(config)
+    claim = Claim.from_token(token, config, lazy=True)
+    organization_role = claim.get_role(OrganizationId(1))
+
+    content = claim.content
+    assert isinstance(content, UserClaim)
+    assert content.id == 12345
+    assert content.node_id == "N:user:12345"
+    assert content.roles[0] is organization_role
+    assert claim.content is content
+    assert claim._payload is None
+    assert claim.get_role(OrganizationId(1)) is organization_role
+    assert claim.dataset_ids == [DatasetId(4), DatasetId(2)]
+
+
+def test_lazy_claim_content_does_not_decode_roles():
+    claim = Claim.from_token(make_claim().encode(config), config, lazy=True)
+    assert claim.content.id == 12345
+    assert len(claim.content.roles) == 4
+    assert decoded_count(claim) == 0
+
+    index = claim.role_index
+    assert claim.content.roles[-1] == WorkspaceRole(
+        id=WorkspaceId(3), role=RoleType.EDITOR
+    )
+    assert decoded_count(claim) == 1
+    assert claim.content.roles == make_claim().content.roles
+    assert decoded_count(claim) == 4
+    assert claim.role_index is index
+
+
+def test_lazy_roles_are_a_list():
+    claim = Claim.from_token(make_claim().encode(config), config, lazy=True)
+    roles = claim.content.roles
+    expected = make_claim().content.roles
+    assert isinstance(roles, list)
+    assert copy.copy(roles) == copy.deepcopy(roles) == expected
+    assert type(pickle.loads(pickle.dumps(roles))) is list
+    assert pickle.loads(pickle.dumps(claim)).content == make_claim().content
+    assert roles[1:3] == expected[1:3]
+    with pytest.raises(IndexError):
+        roles[4]
+
+
+def test_lazy_claim_shared_between_threads():
+    data = dict(load_claim("claim_complex_roles.json"), exp=2**31, iat=0)
+    data["roles"] = [
+        {"type": "dataset_role", "id": i, "role": "viewer"} for i in range(200)
+    ]
+    expected = Claim.from_dict(dict(data)).content
+
+    def check(claim):
+        # Mixes decoding single roles and the whole list
+        claim.get_role(DatasetId(199))
+        return claim.content
+
+    # Switch threads as often as possible, to interleave the decoding
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(20):
+            claim = Claim.from_dict(dict(data), lazy=True)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                contents = list(executor.map(check, [claim] * 16))
+            assert all(content == expected for content in contents)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "claim_complex_roles.json",
+        "claim_locked_datasets.json",
+        "claim_secret_key_id.json",
+        "claim_simple_service.json",
+        "claim_with_explicit_session.json",
+        "claim_with_unsupported_features.json",
+    ],
+)
+def test_lazy_fixtures(name):
+    data = load_claim(name)
+    data.update(exp=2**31, iat=0)
+    lazy = Claim.from_dict(dict(data), lazy=True)
+    eager = Claim.from_dict(dict(data))
+    for role in eager.content.roles:
+        assert lazy.get_role(role.id) == eager.get_role(role.id)
+    assert lazy.organization_ids == eager.organization_ids
+    assert lazy.dataset_node_ids == eager.dataset_node_ids
+    assert lazy.is_service_claim == eager.is_service_claim
+    assert lazy.content == claim_from_dict(load_claim(name))
+
+
+def test_lazy_claim_verifies_up_front():
+    token = make_claim().encode(JwtConfig("other-key"))
+    with pytest.raises(jwt.exceptions.InvalidSignatureError):
+        Claim.from_token(token, config, lazy=True)
+
+    expired = Claim.from_claim_type(ServiceClaim(roles=[]), -10).encode(config)
+    with pytest.raises(jwt.exceptions.ExpiredSignatureError):
+        Claim.from_token(expired, config, lazy=True)
+
+    invalid = jwt.encode(
+        {"type": "temporary", "roles": [], "exp": 2**31, "iat": 0}, config.key
+    )
+    with pytest.raises(ValueError):
+        Claim.from_token(invalid, config, lazy=True)
+
+
+def test_lazy_claim_content_can_be_replaced():
+    claim = Claim.from_token(make_claim().encode(config), config, lazy=True)
+    claim.content = ServiceClaim(
+        roles=[OrganizationRole(id=OrganizationId(5), role=RoleType.OWNER)]
+    )
+    assert claim.is_service_claim
+    assert claim.head_organization_id == OrganizationId(5)
@@ -9,7 +9,12 @@ from auth_middleware.role import (
     WorkspaceId,
 )
 from auth_middleware.models import RoleType, FeatureFlag
+import copy
+import dataclasses
 import datetime
+import pickle
+
+import pytest
 
 
 def test_session_browser_type():
@@ -116,3 +121,88 @@ def test_encode_organization_secret_key():
 
     assert claim_from_dict(data) is not None
     assert claim_from_dict(data) == claim
+
+
+def test_model_type_collections_are_cached():
+    assert FeatureFlag.values() is FeatureFlag.values()
+    assert FeatureFlag.members() is FeatureFlag.members()
+    assert FeatureFlag.values() == tuple(flag.value for flag in FeatureFlag)
+    assert RoleType.members() == tuple(RoleType)
+    assert RoleType.value_set() == frozenset(role.value for role in RoleType)
+
+
+def test_model_type_collections_are_per_class():
+    assert FeatureFlag.values() != RoleType.values()
+    assert "owner" not in FeatureFlag.value_set()
+
+
+def test_from_value_or_none():
+    assert FeatureFlag.from_value_or_none("concepts_feature") is (
+        FeatureFlag.CONCEPTS_FEATURE
+    )
+    assert FeatureFlag.from_value_or_none("unsupported_feature") is None
+    assert FeatureFlag.from_value_or_none(["concepts_feature"]) is None
+    assert RoleType.from_value_or_none("concepts_feature") is None
+
+
+def test_models_are_slotted():
+    role = OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER)
+    claim = UserClaim(id=1, roles=[role])
+    for value in (role, role.id, DatasetId("*"), claim, ServiceClaim(roles=[role])):
+        assert not hasattr(value, "__dict__")
+
+
+def test_models_are_frozen():
+    role = DatasetRole(id=DatasetId(1), role=RoleType.OWNER)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        role.role = RoleType.VIEWER
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        role.id.id = 2
+
+
+def test_ids_are_hashable():
+    lookup = {DatasetId(1): "dataset", OrganizationId(1): "organization"}
+    assert lookup[DatasetId("1")] == "dataset"
+    assert lookup[OrganizationId(1)] == "organization"
+    assert WorkspaceId(1) not in lookup
+    assert hash(DatasetRole(id=DatasetId(1), role=RoleType.OWNER)) == hash(
+        DatasetRole(id=DatasetId(1), role=RoleType.OWNER)
+    )
+
+
+def test_roles_are_hashable():
+    def role():
+        return OrganizationRole(
+            id=OrganizationId(1),
+            role=RoleType.OWNER,
+            enabled_features=[FeatureFlag.CONCEPTS_FEATURE],
+        )
+
+    assert role().enabled_features == (FeatureFlag.CONCEPTS_FEATURE,)
+    assert {role(): "owner"}[role()] == "owner"
+    # Claims hold a list of roles: frozen, but not hashable
+    with pytest.raises(TypeError):
+        hash(UserClaim(id=1, roles=[role()]))
+
+
+def test_models_copy_and_pickle():
+    role = OrganizationRole(
+        id=OrganizationId("*"),
+        role=RoleType.OWNER,
+        enabled_features=[FeatureFlag.CONCEPTS_FEATURE],
+    )
+    claim = UserClaim(id=1, roles=[role], node_id="N:user:1")
+    for copied in (copy.deepcopy(claim), pickle.loads(pickle.dumps(claim))):
+        assert copied == claim
+        assert copied.roles[0].id.wildcard == "*"
+
+
+def test_models_json_round_trip():
+    claim = UserClaim(
+        id=1,
+        roles=[
+            OrganizationRole(id=OrganizationId(1), role=RoleType.OWNER),
+            DatasetRole(id=DatasetId(2), role=RoleType.EDITOR, locked=True),
+        ],
+    )
+    assert UserClaim.from_json(claim.to_json()) == claim
@@ -1,7 +1,10 @@
 from auth_middleware.models import (
     RoleType,
+    Permission,
     OrganizationLevelPermission,
     DatasetPermission,
+    permission_mask,
+    permissions_in_mask,
 )
 
 
@@ -34,3 +37,49 @@ def test_role_missing_permissions():
             DatasetPermission.DELETE_DATASET,
         ]
     )
+
+
+def test_role_permissions_match_masks():
+    all_permissions = [
+        permission for cls in Permission.__subclasses__() for permission in cls
+    ]
+    for role, permissions in RoleType.role_permissions().items():
+        assert sorted(role.permissions, key=str) == sorted(permissions, key=str)
+        for permission in all_permissions:
+            assert role.has_permission(permission) == (permission in permissions)
+
+
+def test_permission_bits_are_distinct():
+    bits = [
+        permission.mask for cls in Permission.__subclasses__() for permission in cls
+    ]
+    assert len(set(bits)) == len(bits)
+    assert all(bin(bit).count("1") == 1 for bit in bits)
+
+
+def test_role_masks_are_nested():
+    roles = [
+        RoleType.GUEST,
+        RoleType.VIEWER,
+        RoleType.EDITOR,
+        RoleType.MANAGER,
+        RoleType.OWNER,
+    ]
+    for lower, higher in zip(roles, roles[1:]):
+        assert permissions_in_mask(higher.mask, lower.mask)
+        assert not permissions_in_mask(lower.mask, higher.mask)
+
+
+def test_permissions_in_mask():
+    required = permission_mask(
+        [DatasetPermission.VIEW_FILES, DatasetPermission.EDIT_FILES]
+    )
+    assert permissions_in_mask(RoleType.EDITOR.mask, required)
+    assert not permissions_in_mask(RoleType.VIEWER.mask, required)
+    assert permissions_in_mask(RoleType.VIEWER.mask, [DatasetPermission.VIEW_FILES])
+    assert permissions_in_mask(RoleType.GUEST.mask, [])
+
+
+def test_role_has_unknown_permission():
+    assert not RoleType.OWNER.has_permission("delete_dataset")
+    assert not RoleType.OWNER.has_permissions(["delete_dataset"])
@@ -0,0 +1,106 @@
+import jwt
+import pytest
+from auth_middleware import Claim, ClaimSchema, InvalidClaimError, UserClaim
+from auth_middleware.compact import compact_payload
+from auth_middleware.config import JwtConfig
+from auth_middleware.encoder import encoder_for
+from auth_middleware.schema import get_claim_schema, set_claim_schema
+from benchmarks.cases import load_fixtures, synthetic_claim
+from test.utils import config
+
+
+@pytest.fixture
+def schema():
+    previous = get_claim_schema()
+    schema = ClaimSchema(max_roles=10, max_token_size=4096)
+    set_claim_schema(schema)
+    yield schema
+    set_claim_schema(previous)
+
+
+def make_token(payload, token_config=config):
+    payload = dict(payload, exp=2**31, iat=0)
+    return jwt.encode(payload, token_config.key, algorithm=token_config.algorithm)
+
+
+def user_claim(**roles):
+    role = dict({"type": "dataset_role", "id": 1, "role": "owner"}, **roles)
+    return {"type": "user_claim", "id": 1, "roles": [role]}
+
+
+@pytest.mark.parametrize("name,data", sorted(load_fixtures().items()))
+def test_fixtures_are_valid(name, data):
+    data = dict(data, exp=2**31, iat=0)
+    assert ClaimSchema().validate(dict(data)) == data
+
+
+@pytest.mark.parametrize(
+    "payload,message",
+    [
+        ({"type": "temporary", "roles": []}, "Invalid claim type"),
+        ({"type": ["user_claim"], "roles": []}, "Invalid claim type"),
+        ({"roles": []}, "Invalid claim type"),
+        ({"type": "user_claim", "roles": []}, "missing id"),
+        ({"type": "user_claim", "id": "1", "roles": []}, "id has type str"),
+        ({"type": "user_claim", "id": 1}, "list of roles"),
+        ({"type": "user_claim", "id": 1, "roles": {}}, "list of roles"),
+        ({"type": "user_claim", "id": 1, "roles": [1]}, r"roles\[0\]: not an object"),
+        (user_claim(type="admin_role"), r"roles\[0\]: invalid type"),
+        (user_claim(type=None), r"roles\[0\]: invalid type"),
+        (user_claim(role="superuser"), r"roles\[0\]: invalid role"),
+        (user_claim(role=["owner"]), r"roles\[0\]: role has type list"),
+        (user_claim(id=1.5), r"roles\[0\]: id has type float"),
+        (user_claim(locked="yes"), r"roles\[0\]: locked has type str"),
+        (
+            {"type": "service_claim", "roles": [{"type": "dataset_role"}]},
+            "missing role",
+        ),
+        ({"type": "user_claim", "id": 1, "roles": [{}] * 11}, "more than 10 roles"),
+        ({"v": 1, "t": "u", "i": 1, "r": [{}] * 11}, "more than 10 roles"),
+        ({"v": 1, "t": "x", "r": []}, "Invalid compact payload"),
+        ({"v": 2, "t": "u", "i": 1, "r": []}, "Unsupported claim format version"),
+        ({"v": 1, "t": "u", "i": 1, "r": 3}, "list of roles"),
+    ],
+)
+def test_invalid_payloads_are_rejected(schema, payload, message):
+    with pytest.raises(InvalidClaimError, match=message):
+        Claim.from_token(make_token(payload), config)
+
+
+def test_valid_payloads_are_accepted(schema):
+    claim = Claim.from_token(make_token(user_claim(locked=True)), config)
+    assert claim.head_dataset_id.id == 1
+    # Unknown keys are ignored
+    assert Claim.from_token(make_token(user_claim(extra=[])), config)
+
+
+def test_compact_payloads_are_expanded(schema):
+    content = synthetic_claim(5)
+    data = compact_payload(encoder_for(UserClaim)(content))
+    claim = Claim.from_token(make_token(data), config, lazy=True)
+    assert claim.content == content
+
+
+def test_token_size_is_checked_before_verification(schema):
+    token = make_token(user_claim(node_id="x" * 4096), JwtConfig("other-key"))
+    with pytest.raises(InvalidClaimError, match="larger than 4096"):
+        Claim.from_token(token, config)
+
+
+def test_invalid_claims_are_token_errors(schema):
+    from auth_middleware.claim import TOKEN_ERRORS
+
+    results = Claim.from_tokens([make_token(user_claim(role="superuser"))], config)
+    assert isinstance(results[0], TOKEN_ERRORS)
+    assert isinstance(results[0], InvalidClaimError)
+
+
+def test_disabled_schema():
+    previous = get_claim_schema()
+    set_claim_schema(None)
+    try:
+        with pytest.raises(ValueError) as e:
+            Claim.from_token(make_token(user_claim(role="superuser")), config)
+    finally:
+        set_claim_schema(previous)
+    assert not isinstance(e.value, InvalidClaimError)
@@ -0,0 +1,118 @@
+import json
+import warnings
+
+import pytest
+from auth_middleware import wsgi
+from auth_middleware.config import JwtConfig
+from auth_middleware.role import DatasetId
+from auth_middleware.wsgi import ENVIRON_KEY, JwtAuthMiddleware, claim_from_environ
+from test.utils import config, make_token
+
+
+class App:
+    def __init__(self):
+        self.environs = []
+
+    def __call__(self, environ, start_response):
+        self.environs.append(environ)
+        start_response("200 OK", [])
+        return [b"ok"]
+
+
+def call(middleware, authorization=None, path="/"):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path}
+    if authorization is not None:
+        environ["HTTP_AUTHORIZATION"] = authorization
+    response = {}
+
+    def start_response(status, headers):
+        response["status"] = status
+        response["headers"] = headers
+
+    body = b"".join(middleware(environ, start_response))
+    return environ, response, body
+
+
+def bearer(token):
+    return "Bearer {}".format(token)
+
+
+def test_valid_token_sets_environ():
+    app = App()
+    environ, response, _ = call(JwtAuthMiddleware(app, config), bearer(make_token(1)))
+    assert response["status"] == "200 OK"
+    assert app.environs == [environ]
+    assert claim_from_environ(environ).head_dataset_id == DatasetId(1)
+
+
+@pytest.mark.parametrize(
+    "authorization",
+    [
+        None,
+        "Basic dXNlcjpwYXNz",
+        bearer("not-a-token"),
+        bearer(make_token(1, seconds=-10)),
+        bearer(make_token(1, token_config=JwtConfig("other-key"))),
+    ],
+)
+def test_rejects_before_app(authorization):
+    app = App()
+    environ, response, body = call(JwtAuthMiddleware(app, config), authorization)
+    assert app.environs == []
+    assert ENVIRON_KEY not in environ
+    assert response["status"] == "401 Unauthorized"
+    assert ("WWW-Authenticate", "Bearer") in response["headers"]
+    assert "detail" in json.loads(body)
+
+
+def test_exempt_paths():
+    app = App()
+    middleware = JwtAuthMiddleware(app, config, exempt_paths=["/health"])
+    _, response, _ = call(middleware, path="/health")
+    assert response["status"] == "200 OK"
+
+
+def test_stats_and_status_path():
+    middleware = JwtAuthMiddleware(App(), config, status_path="/_auth/status")
+    token = make_token(1)
+    call(middleware, bearer(token))
+    call(middleware, bearer(token))
+    call(middleware, bearer("not-a-token"))
+
+    stats = middleware.stats()
+    assert stats.requests == 3
+    assert stats.rejected == 1
+    assert stats.verify_seconds > 0
+    assert stats.cache.hits == 1
+
+    _, response, body = call(middleware, path="/_auth/status")
+    assert response["status"] == "200 OK"
+    status = json.loads(body)
+    assert status["requests"] == 3
+    assert status["cache"]["hits"] == 1
+
+
+def test_cache_is_per_process(monkeypatch):
+    middleware = JwtAuthMiddleware(App(), config)
+    call(middleware, bearer(make_token(1)))
+    cache = middleware.cache
+    assert len(cache) == 1
+
+    monkeypatch.setattr(wsgi.os, "getpid", lambda: -1)
+    assert middleware.cache is not cache
+    assert len(middleware.cache) == 0
+    assert middleware.stats().requests == 0
+    assert middleware.stats().pid == -1
+
+
+def test_warm_up_is_idempotent():
+    wsgi.warm_up()
+    wsgi.warm_up()
+
+
+def test_warm_up_does_not_warn():
+    # PyJWT warns about short HMAC keys; `warm_up` runs on import
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        wsgi.warm_up()
+    assert [w for w in caught if w.category.__module__.startswith("jwt")] == []
@@ -1,5 +1,7 @@
 import json
-from auth_middleware import JwtConfig
+from auth_middleware import Claim, JwtConfig, UserClaim
+from auth_middleware.models import RoleType
+from auth_middleware.role import DatasetId, DatasetRole
 
 config = JwtConfig("secret-key")
 
@@ -7,3 +9,21 @@ config = JwtConfig("secret-key")
 def load_claim(name: str) -> dict:
     with open("./resources/{}".format(name)) as f:
         return json.load(f)
+
+
+def make_claim(dataset_id=1, seconds=10, roles=1, role=RoleType.OWNER) -> Claim:
+    """
+    A user claim with ``roles`` dataset roles, for the datasets from
+    ``dataset_id`` on, expiring in ``seconds``.
+    """
+    data = UserClaim(
+        id=12345,
+        roles=[
+            DatasetRole(id=DatasetId(dataset_id + i), role=role) for i in range(roles)
+        ],
+    )
+    return Claim.from_claim_type(data, seconds)
+
+
+def make_token(dataset_id=1, seconds=10, token_config=config, **kwargs) -> str:
+    return make_claim(dataset_id, seconds, **kwargs).encode(token_config)